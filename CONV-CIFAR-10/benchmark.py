@@ -0,0 +1,137 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+"""
+Layer microbenchmarks: nnCustom Conv2D & SpatialPool2D vs. torch.nn.functional
+
+Times the forward pass of each layer, one image after the other (as
+the engine works), across batch sizes & thread counts, checks it
+against F.conv2d / F.max_pool2d and writes the results as JSON (to
+compare commits). Conv2D & SpatialPool2D have no backward pass yet,
+so their backward & train step are reported as n/a.
+
+Usage: python benchmark.py [--batch-sizes 1 4] [--threads 1 4] [--json bench.json]
+
+@author: apatgao
+"""
+# imports for system library
+from __future__ import print_function
+import argparse, json, os, platform, subprocess, time, torch
+import torch.nn.functional as F
+# Custom imports
+import nnCustom as nnc
+
+PHASES = ['forward', 'backward', 'train step']
+
+
+def best_time(func, repeat):
+    """ Fastest of <repeat> calls (ms), after a warm up """
+    func()
+    times = []
+    for _ in range(repeat):
+        start = time.time()
+        func()
+        times.append(time.time() - start)
+    return 1e3 * min(times)
+
+
+def bench_conv(images, f=5, k=6, pad=0, stride=1):
+    """ Conv2D vs. F.conv2d: (forward, reference, max error) """
+    conv = nnc.Conv2D(images.size()[1:], f, k, pad, stride)
+
+    def forward():
+        outputs = []
+        for image in images:
+            # Feature maps accumulate over calls: one volume per image
+            conv.feature_volume = torch.zeros(0, 0)
+            outputs.append(conv.convolve(image.unsqueeze(0)).clone())
+        return torch.stack(outputs)
+
+    def reference():
+        return F.conv2d(images, conv.kernels, conv.biases.view(-1), stride, pad)
+
+    return forward, reference, torch.max(torch.abs(forward() - reference()))
+
+
+def bench_pool(images, f=2, stride=2):
+    """ SpatialPool2D('max') vs. F.max_pool2d: (forward, reference, max error) """
+    pool = nnc.SpatialPool2D(images.size()[1:], f, stride, 'max')
+
+    def forward():
+        outputs = []
+        for maps in images:
+            pool.pooled_volume = torch.zeros(0, 0)
+            outputs.append(pool.pooling(maps).clone())
+        return torch.stack(outputs)
+
+    def reference():
+        return F.max_pool2d(images, f, stride)
+
+    return forward, reference, torch.max(torch.abs(forward() - reference()))
+
+
+# Layer: (benchmark, input [C x H x W])
+LAYERS = {
+    'Conv2D': (bench_conv, (3, 32, 32)),
+    'SpatialPool2D': (bench_pool, (6, 28, 28)),
+}
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                       stderr=open(os.devnull, 'w')).decode().strip()
+    except Exception:  # Not a git checkout
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--layers', nargs='+', choices=sorted(LAYERS), default=sorted(LAYERS))
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 4])
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, torch.get_num_threads()])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--tolerance', type=float, default=1e-4,
+                        help='Max abs. difference to the torch result')
+    parser.add_argument('--json', metavar='file', help='Write the results here')
+    opts = parser.parse_args()
+
+    results = []
+    print('\n%-14s %-11s %6s %8s %14s %12s %10s %10s' % ('Layer', 'Phase', 'Batch', 'Threads',
+                                                       'nnCustom (ms)', 'torch (ms)', 'Speedup',
+                                                       'Max error'))
+    for threads in sorted(set(opts.threads)):
+        torch.set_num_threads(threads)
+        for name in opts.layers:
+            bench, input_dim = LAYERS[name]
+            for batch_size in opts.batch_sizes:
+                images = torch.randn(batch_size, *input_dim)
+                forward, reference, error = bench(images)
+                for phase in PHASES:
+                    result = {'layer': name, 'phase': phase, 'batch_size': batch_size,
+                              'threads': threads, 'ms': None, 'torch_ms': None,
+                              'max_error': None, 'ok': True}
+                    if phase == 'forward':
+                        result.update(ms=best_time(forward, opts.repeat),
+                                      torch_ms=best_time(reference, opts.repeat),
+                                      max_error=float(error), ok=float(error) <= opts.tolerance)
+                        print('%-14s %-11s %6d %8d %14.3f %12.3f %9.4fx %10.2e%s' % (
+                            name, phase, batch_size, threads, result['ms'], result['torch_ms'],
+                            result['torch_ms'] / result['ms'], result['max_error'],
+                            '' if result['ok'] else '  MISMATCH'))
+                    else:
+                        print('%-14s %-11s %6d %8d %14s %12s %10s %10s' % (
+                            name, phase, batch_size, threads, 'n/a', 'n/a', '-', '-'))
+                    results.append(result)
+
+    if opts.json:
+        with open(opts.json, 'w') as f:
+            json.dump({'engine': 'CONV-CIFAR-10/nnCustom.py', 'commit': git_commit(),
+                       'torch': torch.__version__, 'host': platform.node(),
+                       'machine': platform.machine(), 'results': results}, f, indent=1)
+        print('\nResults saved as %s' % opts.json)
+    if not all(r['ok'] for r in results):
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
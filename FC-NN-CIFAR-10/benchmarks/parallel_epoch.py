@@ -0,0 +1,80 @@
+"""
+Epoch wall-time: single process vs. data-parallel vs. Hogwild training
+
+Run from FC-NN-CIFAR-10/:
+    python -m benchmarks.parallel_epoch --workers 2 4 --size 10000
+"""
+
+# System imports
+from __future__ import print_function
+
+import argparse
+import time
+
+import torch
+
+# Custom imports
+from data.dataset import ImageDataset
+from libs import nn as nnc
+
+from tools import create
+from tools.data_parallel import data_parallel
+from tools.hogwild import hogwild
+from tools.train_net import train_loop
+
+
+class SyntheticCIFAR10(ImageDataset):
+    """ Random CIFAR-10 shaped (image, label) examples """
+
+    def __init__(self, size):
+        super(SyntheticCIFAR10, self).__init__(torch.randint(0, 256, (size, 3, 32, 32)).byte(),
+                                               torch.LongTensor(size).random_(0, 10))
+
+
+def new_model(batch_size):
+    """ The FC net, one epoch of plain SGD """
+    model = nnc.ModelNN()
+    model.weights_decay, model.lr, model.epochs = 0.01, 0.01, 1
+    model.batch_size = batch_size
+    create.add_layers(model)
+    return model
+
+
+def time_epoch(mode, dataset, batch_size, workers=1):
+    """ Wall time (s) of one training epoch in <mode> """
+    model = new_model(batch_size)
+    start = time.time()
+    if mode == 'serial':
+        train_loop(model, dataset, model.train)
+    elif mode == 'data-parallel':
+        data_parallel(model, dataset, workers, train_loop)
+    else:
+        hogwild(model, dataset, workers, train_loop)
+    return time.time() - start, model.loss
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--workers", type=int, nargs='+', default=[2, 4])
+    parser.add_argument("--size", type=int, default=10000, help="Epoch size (images)")
+    parser.add_argument("--batch-size", type=int, default=100)
+    opts = parser.parse_args()
+
+    dataset = SyntheticCIFAR10(opts.size)
+    runs = [('serial', 1)]
+    for workers in opts.workers:
+        runs += [('data-parallel', workers), ('hogwild', workers)]
+
+    results = []
+    for mode, workers in runs:
+        seconds, loss = time_epoch(mode, dataset, opts.batch_size, workers)
+        results.append((mode, workers, seconds, loss))
+
+    serial = results[0][2]
+    print('\n%-14s %8s %10s %9s %10s' % ('Mode', 'Workers', 'Epoch (s)', 'Speedup', 'Loss'))
+    for mode, workers, seconds, loss in results:
+        print('%-14s %8d %10.2f %8.2fx %10.4f' % (mode, workers, seconds, serial / seconds, loss))
+
+
+if __name__ == '__main__':
+    main()
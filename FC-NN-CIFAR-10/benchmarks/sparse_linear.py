@@ -0,0 +1,88 @@
+"""
+Sparse (CSR) vs. dense Linear layer inference, over sparsity levels
+
+Finds the sparsity at which the sparse matmul of a magnitude pruned
+layer beats the dense one (PRUNE: SPARSE_AT in the config).
+
+Run from FC-NN-CIFAR-10/:
+    python -m benchmarks.sparse_linear --batch-sizes 1 100 1000
+"""
+
+# System imports
+from __future__ import print_function
+
+import argparse
+import time
+
+import torch
+
+# Custom imports
+from libs import nn as nnc
+
+# Linear layers of the FC net
+SHAPES = [(32 * 32 * 3, 2048), (2048, 512), (512, 128)]
+
+
+def best_time(func, repeat):
+    """ Fastest of <repeat> calls (s), after a warm up """
+    func()
+    times = []
+    for _ in range(repeat):
+        start = time.time()
+        func()
+        times.append(time.time() - start)
+    return min(times)
+
+
+def compare(shape, batch_size, sparsity, repeat):
+    """ Dense & sparse forward times of a layer pruned to <sparsity> """
+    model = nnc.ModelNN()
+    model.weights_decay = 0.01
+    layer = nnc.LinearLayer(*shape)
+    model.add(layer)
+    model.prune(sparsity)
+    ipt = torch.randn(batch_size, shape[0])
+    out = torch.zeros(batch_size, shape[1])
+    dense = best_time(lambda: layer.forward(ipt, out=out), repeat)
+    expected = out.clone()
+    layer.sparsify()
+    # Transposed, as the compiled plans allocate it (no copy)
+    out = torch.zeros(shape[1], batch_size).t()
+    sparse = best_time(lambda: layer.forward(ipt, out=out), repeat)
+    # Same result
+    assert torch.allclose(out, expected, rtol=1e-4, atol=1e-4)
+    return dense, sparse
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--batch-sizes", type=int, nargs='+', default=[1, 100, 1000])
+    parser.add_argument("--sparsities", type=float, nargs='+',
+                        default=[0.5, 0.6, 0.7, 0.8, 0.9, 0.95, 0.98, 0.99])
+    parser.add_argument("--repeat", type=int, default=10)
+    opts = parser.parse_args()
+
+    print('\n%-14s %6s %9s %11s %11s %9s' % ('Layer', 'Batch', 'Sparsity', 'Dense (ms)',
+                                            'Sparse (ms)', 'Speedup'))
+    crossovers = []
+    for shape in SHAPES:
+        for batch_size in opts.batch_sizes:
+            crossover = None
+            for sparsity in opts.sparsities:
+                dense, sparse = compare(shape, batch_size, sparsity, opts.repeat)
+                if crossover is None and sparse < dense:
+                    crossover = sparsity
+                print('%-14s %6d %9.2f %11.3f %11.3f %8.2fx' % (
+                    '%d x %d' % shape, batch_size, sparsity, 1e3 * dense, 1e3 * sparse,
+                    dense / sparse))
+            crossovers.append((shape, batch_size, crossover))
+
+    print('\nSparse beats dense from:')
+    for shape, batch_size, crossover in crossovers:
+        print('  %-14s batch %-6d %s' % ('%d x %d' % shape, batch_size,
+                                          'never' if crossover is None else
+                                          '%.2f sparsity' % crossover))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,176 @@
+"""
+CLI startup cost: time-to-first-batch of every main.py mode
+
+Each mode runs main.main() with that mode's arguments in a fresh
+interpreter, stopping once the first batch has been through the net.
+The runs share a scratch directory holding the dataset cache (synthetic,
+or the real one with --data), its normalization statistics and a saved
+model, as they would be after a first run.
+
+Run from FC-NN-CIFAR-10/:
+    python -m benchmarks.startup --repeat 5 --budget 3.0
+"""
+
+# System imports
+from __future__ import print_function
+
+import argparse
+import json
+import os
+import pickle
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Saved model of the load modes (the name --bms leaves in place)
+MODEL = 'best_model.pkl'
+# main.py arguments of each mode
+MODES = {
+    'bms': ['--bms'],
+    'fit': ['--NEW', '--FIT'],
+    'train': ['--NEW', '--TRAIN'],
+    'test': ['--LOAD', MODEL, '--TEST'],
+    'infer': ['--LOAD', MODEL, '--INFER'],
+    'parity': ['--LOAD', MODEL, '--PARITY', 'precision'],
+}
+# Should not be loaded unless something gets plotted
+PLOTTING = ['matplotlib', 'bokeh']
+
+
+class FirstBatch(Exception):
+    """ Raised to stop main() once the first batch is done """
+
+
+def child(mode, launched, cfg):
+    """ One mode, in this (fresh) interpreter; prints its stage times
+    (seconds since <launched>) as JSON """
+    import main
+    times = {'import': time.time() - launched}
+
+    def stage_done(stage, func):
+        def timed(*args, **kwargs):
+            result = func(*args, **kwargs)
+            times[stage] = time.time() - launched
+            if stage == 'first batch':
+                raise FirstBatch
+            return result
+        return timed
+
+    if mode != 'bms':
+        from libs import nn as nnc
+        from tools import create, model_store
+        # Model built (new) or loaded, first train/test step done
+        create.create_model = stage_done('model', create.create_model)
+        model_store.load_model = stage_done('model', model_store.load_model)
+        nnc.ModelNN.train = stage_done('first batch', nnc.ModelNN.train)
+        nnc.ModelNN.test = stage_done('first batch', nnc.ModelNN.test)
+
+    sys.argv = ['main.py', '--CFG', cfg] + MODES[mode]
+    sys.stdout = open(os.devnull, 'w')
+    try:
+        main.main()
+    except FirstBatch:
+        pass
+    times['done'] = time.time() - launched
+    times['plotting'] = [name for name in PLOTTING if name in sys.modules]
+    sys.stdout = sys.__stdout__
+    print(json.dumps(times))
+
+
+def setup(scratch, cfg, data, size):
+    """ Dataset cache (<data>'s, else <size> random train images), its
+    statistics & a new model saved as MODEL, under <scratch> """
+    import torch
+    from data import dataset as dset
+    from libs import check_args
+    from tools import create
+
+    directory = os.path.join(scratch, 'data', 'cifar10')
+    os.makedirs(directory)
+    os.makedirs(os.path.join(scratch, 'outputs', 'models'))
+    for split, num_images in (('train', size), ('test', size // 5)):
+        cache = os.path.join(directory, split + '.bin')
+        if data:
+            os.symlink(os.path.abspath(os.path.join(data, 'cifar10', split + '.bin')), cache)
+        else:
+            dset.save_cache(cache, torch.randint(0, 256, (num_images, 3, 32, 32)).byte(),
+                            torch.randint(0, 10, (num_images,)))
+
+    cwd, argv, stdout = os.getcwd(), sys.argv, sys.stdout
+    os.chdir(scratch)
+    sys.argv, sys.stdout = ['main.py', '--CFG', cfg, '--NEW'], open(os.devnull, 'w')
+    try:
+        check_args.parse_arg()
+        model = create.create_model()
+        model.optimum['Weights'], model.optimum['Biases'] = model.weights, model.biases
+        model.set_logs()
+        with open(os.path.join('outputs', 'models', MODEL), 'wb') as f:
+            pickle.dump(model.optimum, f)
+    finally:
+        os.chdir(cwd)
+        sys.argv, sys.stdout = argv, stdout
+
+
+def run(mode, scratch, cfg):
+    """ Stage times of <mode> in a new process """
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(
+        [ROOT] + os.environ.get('PYTHONPATH', '').split(os.pathsep)).rstrip(os.pathsep))
+    launched = time.time()
+    out = subprocess.check_output([sys.executable, '-m', 'benchmarks.startup',
+                                   '--child', mode, '--launched', repr(launched),
+                                   '--cfg', cfg], cwd=scratch, env=env)
+    return json.loads(out.decode().strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--modes", nargs='+', choices=sorted(MODES),
+                        default=['bms', 'fit', 'train', 'test', 'infer', 'parity'])
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per mode (median)")
+    parser.add_argument("--cfg", default=os.path.join(ROOT, 'configs', 'fully_connected.yaml'))
+    parser.add_argument("--data", help="Directory of a real dataset cache (cifar10/*.bin); "
+                                       "default: synthetic")
+    parser.add_argument("--size", type=int, default=50000, help="Synthetic training images")
+    parser.add_argument("--budget", type=float, help="Fail if a mode's time-to-first-batch "
+                                                     "exceeds this (s)")
+    parser.add_argument("--child", choices=sorted(MODES), help=argparse.SUPPRESS)
+    parser.add_argument("--launched", type=float, help=argparse.SUPPRESS)
+    opts = parser.parse_args()
+    cfg = os.path.abspath(opts.cfg)
+
+    if opts.child:
+        child(opts.child, opts.launched, cfg)
+        return
+
+    scratch = tempfile.mkdtemp(prefix='startup_')
+    try:
+        setup(scratch, cfg, opts.data, opts.size)
+        print('\n%-8s %10s %10s %16s   %s' % ('Mode', 'Import (s)', 'Model (s)',
+                                             'First batch (s)', 'Plotting libs loaded'))
+        over_budget = []
+        for mode in opts.modes:
+            runs = [run(mode, scratch, cfg) for _ in range(opts.repeat)]
+            median = {}
+            for stage in ('import', 'model', 'first batch', 'done'):
+                values = sorted(r[stage] for r in runs if stage in r)
+                median[stage] = values[len(values) // 2] if values else None
+            # --bms builds nothing: until it is done
+            total = median['first batch'] or median['done']
+            model = '-' if median['model'] is None else '%.3f' % median['model']
+            print('%-8s %10.3f %10s %16.3f   %s' % (mode, median['import'], model, total,
+                                                  ', '.join(runs[0]['plotting']) or '-'))
+            if opts.budget is not None and total > opts.budget:
+                over_budget.append(mode)
+    finally:
+        shutil.rmtree(scratch)
+
+    if over_budget:
+        print('\nOver the %.2fs budget: %s' % (opts.budget, ', '.join(over_budget)))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
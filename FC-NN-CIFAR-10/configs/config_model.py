@@ -5,34 +5,51 @@ import yaml
 
 # Custom imports
 from libs.check_args import arguments
+from libs.setup import tuned_batch_size
 
 
 def set_hyper_parameters(config_file, model):
     global cfg
     args = arguments()
     with open(config_file, 'r') as f:
-        cfg = yaml.load(f)
+        cfg = yaml.safe_load(f)
+    if tuned_batch_size():
+        # --AUTOTUNE
+        cfg["FIT"]["BATCH_SIZE"] = cfg["TRAIN"]["BATCH_SIZE"] = tuned_batch_size()
 
     model.model_type += cfg["MODEL"]["TYPE"]
 
     model.weights_decay = cfg["SOLVER"]["WEIGHT_DECAY"]
     model.reg = cfg["SOLVER"]["REG"]
+    model.solver = cfg["SOLVER"]["TYPE"]
+    model.momentum = cfg["SOLVER"]["MOMENTUM"]
+    model.betas = tuple(cfg["SOLVER"]["BETAS"])
+    model.eps = cfg["SOLVER"]["EPS"]
+    model.set_precision(cfg["PRECISION"]["COMPUTE"], cfg["PRECISION"]["LOSS_SCALE"])
+    model.sparse_at = cfg["PRUNE"]["SPARSE_AT"]
     if args.FIT:
         model.data_set = cfg["FIT"]["DATASET"]
         model.lr = cfg["FIT"]["BASE_LR"]
         model.lr_policy += cfg["FIT"]["LR_POLICY"]
         model.decay_rate = cfg["FIT"]["DECAY_RATE"]
         model.epochs = cfg["FIT"]["EPOCHS"]
+        model.batch_size = cfg["FIT"]["BATCH_SIZE"]
+        model.accum_steps = cfg["FIT"]["ACCUM_STEPS"]
     elif args.TRAIN:
         model.data_set = cfg["TRAIN"]["DATASET"]
         model.lr = cfg["TRAIN"]["BASE_LR"]
         model.lr_policy += cfg["TRAIN"]["LR_POLICY"]
         model.decay_rate = cfg["TRAIN"]["DECAY_RATE"]
         model.epochs = cfg["TRAIN"]["EPOCHS"]
+        model.batch_size = cfg["TRAIN"]["BATCH_SIZE"]
+        model.accum_steps = cfg["TRAIN"]["ACCUM_STEPS"]
+        model.prefetch = cfg["TRAIN"]["PREFETCH"]
     if args.TEST:
         model.data_set = cfg["TEST"]["DATASET"]
     if args.INFER:
         model.data_set = cfg["TEST"]["DATASET"]
+    if args.PARITY or args.EXPORT:
+        model.data_set = cfg["TEST"]["DATASET"]
     return
 
 
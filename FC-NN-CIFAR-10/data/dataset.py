@@ -7,37 +7,240 @@ Fetch, setup, shuffle data set.
 # System imports
 from __future__ import print_function
 
+import json
 import os
 import pickle
-from random import shuffle
+import queue
+import struct
+import threading
+import time
+import zlib
 from subprocess import call
 
+import numpy as np
 import torch
 
+# Binary cache: magic, version, N, C, H, W, crc32 of the payload 
+# (64 bytes, little-endian), then N x C x H x W uint8 images & N int64 labels
+CACHE_MAGIC = b'CIFARBIN'
+CACHE_VERSION = 1
+CACHE_HEADER = struct.Struct('<8s6I')
+CACHE_HEADER_SIZE = 64
 
-def data_loader(data, batch_size, model_testing=False, shuffled=False):
-    """ Prepares, shuffles given data x"""
-    if shuffled:
-        shuffle(data)
-    images, labels = [], []
-    for x, y in data:
-        images.append(x)
-        labels.append(y)
-    images = torch.stack(images, dim=0)
-    if model_testing:
-        num_batches = 1
-    else:
-        num_batches = len(data) / batch_size
-    mini_batches = []
-    for batch in range(num_batches):
-        b_start = batch * batch_size
-        b_end = (batch + 1) * batch_size
-        mini_batches.append((images[b_start:b_end], labels[b_start:b_end]))
-
-    return mini_batches
-
-
-class CIFAR10:
+
+class BatchSampler(object):
+    """ Index batches over <size> examples, in a new random order on 
+    every pass if <shuffled>. The tail batch (size % batch_size) is 
+    kept, or dropped if <drop_last> """
+
+    def __init__(self, size, batch_size, shuffled=False, drop_last=False):
+        self.size, self.batch_size = size, batch_size
+        self.shuffled, self.drop_last = shuffled, drop_last
+
+    def __len__(self):
+        if self.drop_last:
+            return self.size // self.batch_size
+        return (self.size + self.batch_size - 1) // self.batch_size
+
+    def __iter__(self):
+        order = torch.randperm(self.size) if self.shuffled else torch.arange(self.size)
+        for batch in range(len(self)):
+            yield order[batch * self.batch_size:(batch + 1) * self.batch_size]
+
+
+def gather(dataset, indices):
+    """ (float images, labels) of <dataset> at <indices> """
+    return (dataset.images.index_select(0, indices).float(), 
+            dataset.labels.index_select(0, indices))
+
+
+def data_loader(dataset, batch_size, model_testing=False, shuffled=False, drop_last=False):
+    """ Yields (float images, labels) batches of the given dataset, 
+    shuffled if <shuffled> (the tail batch is kept unless <drop_last>). 
+    Each batch is gathered from the dataset's tensors as it is needed """
+    sampler = BatchSampler(len(dataset), batch_size, shuffled, drop_last)
+    for batch, indices in enumerate(sampler):
+        if model_testing and batch:
+            return
+        # To float one batch at a time
+        yield gather(dataset, indices)
+
+
+class Prefetcher(object):
+    """ Batches of <dataset> (as data_loader's, an epoch per pass), 
+    gathered up to <depth> ahead by a background thread. If <pin_memory>, 
+    uint8 images (to be converted on the GPU) & labels are gathered into 
+    depth + 1 pinned buffers per batch size, allocated once and recycled 
+    when the consumer asks for the next batch, for async copies to the 
+    GPU. Counts how often the consumer found no batch ready """
+
+    def __init__(self, dataset, batch_size, depth=2, shuffled=False, pin_memory=False):
+        self.dataset, self.batch_size, self.shuffled = dataset, batch_size, shuffled
+        self.depth, self.pin_memory = depth, pin_memory
+        # Free pinned (images, labels, copied to the GPU event) per batch size
+        self.free = {}
+        # Batches handed out, summed queue depth at each, 
+        # and how many (and how long) had to be waited for
+        self.batches, self.depths, self.waits, self.wait_time = 0, 0, 0, 0.
+
+    def pinned(self, batch_size, stop):
+        """ Free pinned buffers for <batch_size> images (None if <stop> 
+        is set while waiting for one) """
+        if batch_size not in self.free:
+            free = self.free[batch_size] = queue.Queue()
+            images, labels = self.dataset.images, self.dataset.labels
+            for _ in range(self.depth + 1):
+                free.put((torch.empty((batch_size,) + tuple(images.shape[1:]), 
+                                      dtype=images.dtype).pin_memory(),
+                          torch.empty(batch_size, dtype=labels.dtype).pin_memory(), None))
+        while not stop.is_set():
+            try:
+                images, labels, copied = self.free[batch_size].get(timeout=0.1)
+            except queue.Empty:
+                continue
+            if copied is not None:
+                # The consumer's copy from it is done
+                copied.synchronize()
+            return images, labels
+        return None
+
+    def recycle(self, batch):
+        """ Pinned <batch> free again once the copies queued so far are done """
+        copied = torch.cuda.Event()
+        copied.record()
+        self.free[batch[0].size(0)].put(batch + (copied,))
+
+    def produce(self, batches, stop):
+        """ Fill <batches> with the epoch's batches, until <stop> is set """
+        def put(item):
+            while not stop.is_set():
+                try:
+                    batches.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        try:
+            dataset = self.dataset
+            for indices in BatchSampler(len(dataset), self.batch_size, self.shuffled):
+                if self.pin_memory:
+                    buffers = self.pinned(indices.size(0), stop)
+                    if buffers is None:
+                        return
+                    batch = (torch.index_select(dataset.images, 0, indices, out=buffers[0]), 
+                             torch.index_select(dataset.labels, 0, indices, out=buffers[1]))
+                else:
+                    batch = gather(dataset, indices)
+                if not put(batch):
+                    return
+            put(None)
+        except Exception as e:  # Raised again by the consumer
+            put(e)
+
+    def __iter__(self):
+        self.batches, self.depths, self.waits, self.wait_time = 0, 0, 0, 0.
+        batches, stop = queue.Queue(self.depth), threading.Event()
+        producer = threading.Thread(target=self.produce, args=(batches, stop))
+        producer.daemon = True
+        producer.start()
+        try:
+            while True:
+                depth = batches.qsize()
+                if depth:
+                    batch = batches.get()
+                else:
+                    start = time.time()
+                    batch = batches.get()
+                    self.waits += 1
+                    self.wait_time += time.time() - start
+                if batch is None:
+                    return
+                if isinstance(batch, Exception):
+                    raise batch
+                self.batches += 1
+                self.depths += depth
+                yield batch
+                if self.pin_memory:
+                    self.recycle(batch)
+        finally:
+            stop.set()
+            producer.join()
+
+    def summary(self):
+        """ Queue depth stats: mostly empty means input-bound """
+        batches = max(self.batches, 1)
+        return 'Prefetch queue: %.1f/%d batches deep on average, %d%% waited for (%.2fs)' % (
+            float(self.depths) / batches, self.depth, 100 * self.waits // batches, self.wait_time)
+
+
+def stream_loader(dataset, batch_size):
+    """ Yields (float images, labels) batches of the 
+    given dataset in order, converting one at a time """
+    for b_start in range(0, len(dataset), batch_size):
+        b_end = b_start + batch_size
+        yield dataset.images[b_start:b_end].float(), dataset.labels[b_start:b_end]
+
+
+class ImageDataset(object):
+    """ Images as one contiguous uint8 [N x 3 x 32 x 32] 
+    tensor & their int64 labels [N] """
+
+    def __init__(self, images=None, labels=None):
+        self.images = torch.zeros(0, 3, 32, 32).byte() if images is None else images
+        self.labels = torch.zeros(0).long() if labels is None else labels
+
+    def __len__(self):
+        return self.images.size(0)
+
+    def __getitem__(self, index):
+        """ (image, label) at <index>: an int, slice or index tensor """
+        return self.images[index], self.labels[index]
+
+
+def save_cache(filename, images, labels):
+    """ Write <images> & <labels> as a binary cache (see load_cache) """
+    images = images.contiguous().numpy()
+    labels = labels.numpy().astype('<i8')
+    checksum = zlib.crc32(labels.tobytes(), zlib.crc32(images.tobytes())) & 0xffffffff
+    header = CACHE_HEADER.pack(CACHE_MAGIC, CACHE_VERSION, *(images.shape + (checksum,)))
+    # Written aside, then renamed: readers never see a partial file
+    with open(filename + '.tmp', 'wb') as f:
+        f.write(header.ljust(CACHE_HEADER_SIZE, b'\0'))
+        f.write(images.tobytes())
+        f.write(labels.tobytes())
+    os.rename(filename + '.tmp', filename)
+
+
+def load_cache(filename, verify=False):
+    """ (images, labels) memory mapped from a binary cache, without 
+    copying (pages are shared by all processes reading it); None if 
+    missing or invalid. The payload checksum is checked if <verify> """
+    if not os.path.isfile(filename):
+        return None
+    with open(filename, 'rb') as f:
+        header = f.read(CACHE_HEADER.size)
+    if len(header) < CACHE_HEADER.size:
+        return None
+    magic, version, n, c, h, w, checksum = CACHE_HEADER.unpack(header)
+    if magic != CACHE_MAGIC or version != CACHE_VERSION:
+        return None
+    image_bytes = n * c * h * w
+    if os.path.getsize(filename) != CACHE_HEADER_SIZE + image_bytes + 8 * n:
+        print('Truncated dataset cache %s.' % filename)
+        return None
+    # Copy-on-write: writable tensors, the file is never modified
+    images = np.memmap(filename, dtype='uint8', mode='c', offset=CACHE_HEADER_SIZE, 
+                       shape=(n, c, h, w))
+    labels = np.memmap(filename, dtype='<i8', mode='c', 
+                       offset=CACHE_HEADER_SIZE + image_bytes, shape=(n,))
+    if verify and zlib.crc32(labels, zlib.crc32(images)) & 0xffffffff != checksum:
+        print('Corrupt dataset cache %s.' % filename)
+        return None
+    return torch.from_numpy(images), torch.from_numpy(labels)
+
+
+class CIFAR10(ImageDataset):
     # +++ Data info found here +++ #
 
     data_size = 60000
@@ -50,16 +253,24 @@ class CIFAR10:
                'frog', 'horse',
                'ship', 'truck']
 
-    def __init__(self, directory='.', download=False, train=False, test=False):
-        """ Setup necessary variables for Cifar10 dataset """
+    def __init__(self, directory='.', download=False, train=False, test=False, verify=False):
+        """ Setup necessary variables for Cifar10 dataset: memory 
+        mapped from its binary cache, made from the pickled 
+        batches on first use (checksum checked if <verify>) """
+        super(CIFAR10, self).__init__()
         self.name = 'cifar10'
-        self.data = []
-        self.images = []
-        self.labels = []
         self.dir = directory
+        self.cache = os.path.join(directory, 'cifar10', ('train' if train else 'test') + '.bin')
+        cached = load_cache(self.cache, verify)
+        if cached is not None:
+            self.images, self.labels = cached
+            return
         if download:
             self.download_cifar10()
         self.get_dataset(train, test)
+        print('Caching the dataset as %s ...' % self.cache, end=" ")
+        save_cache(self.cache, self.images, self.labels)
+        print("done.\n")
 
     def download_cifar10(self):
         """ If dataset does not exist, downloads it """
@@ -102,7 +313,9 @@ class CIFAR10:
             print('testing data ...', end = " ")
             og_num_batches = 1
         og_batch_size = 10000
-        self.labels = []
+        # Filled in place, batch by batch
+        self.images = torch.zeros(og_num_batches * og_batch_size, 3, 32, 32).byte()
+        self.labels = torch.zeros(og_num_batches * og_batch_size).long()
 
         for batch in range(og_num_batches):
             if train:
@@ -114,17 +327,49 @@ class CIFAR10:
             data_file.close()
 
             image_data = tuples['data'].reshape(og_batch_size, 3, 32, 32).astype("uint8")
+            b_start = batch * og_batch_size
+            self.images[b_start:b_start + og_batch_size] = torch.from_numpy(image_data)
+            self.labels[b_start:b_start + og_batch_size] = torch.LongTensor(tuples['labels'])
 
-            if batch == 0:
-                self.images = torch.from_numpy(image_data).type(torch.FloatTensor)
-            else:
-                self.images = torch.cat((self.images, torch.from_numpy(image_data).type(torch.FloatTensor)), 0)
-            for label in tuples['labels']:
-                self.labels.append(label)
+        print("done.\n")
 
-        for i, l in zip(self.images, self.labels):
-            self.data.append((i, l))
+        return self
+
+
+def cache_id(filename):
+    """ [payload checksum, size] of a binary cache (None if missing) """
+    if not os.path.isfile(filename):
+        return None
+    with open(filename, 'rb') as f:
+        header = f.read(CACHE_HEADER.size)
+    if len(header) < CACHE_HEADER.size:
+        return None
+    return [CACHE_HEADER.unpack(header)[-1], os.path.getsize(filename)]
 
-        print("done.\n")
 
-        return self.data
+def norm_stats(directory='data', chunk=10000):
+    """ Per channel (mean, std) of the CIFAR-10 training pixels, computed 
+    once (<chunk> images at a time) & kept next to the dataset, along 
+    with the id of the cache they came from (recomputed if it changed) """
+    filename = os.path.join(directory, 'cifar10', 'norm_stats.json')
+    dataset = CIFAR10(directory, download=True, train=True)
+    source = cache_id(dataset.cache)
+    if os.path.isfile(filename):
+        with open(filename) as f:
+            stats = json.load(f)
+        if source is not None and stats.get('source') == source:
+            return stats['mean'], stats['std']
+        print('Dataset changed, recomputing its normalization statistics.')
+    images = dataset.images
+    total, total_sq = torch.zeros(3).double(), torch.zeros(3).double()
+    for c_start in range(0, images.size(0), chunk):
+        pixels = images[c_start:c_start + chunk].double().transpose(0, 1).reshape(3, -1)
+        total += pixels.sum(1)
+        total_sq += (pixels * pixels).sum(1)
+    count = images.size(0) * images.size(2) * images.size(3)
+    mean = total / count
+    std = (total_sq / count - mean * mean).sqrt()
+    stats = {'mean': mean.tolist(), 'std': std.tolist(), 'source': source}
+    with open(filename, 'w') as f:
+        json.dump(stats, f, indent=2)
+    return stats['mean'], stats['std']
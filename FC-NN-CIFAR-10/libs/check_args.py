@@ -4,6 +4,10 @@
 import argparse
 import sys
 
+# Set by parse_arg()
+args = None
+use_gpu = False
+
 
 def parse_arg():
     parser = argparse.ArgumentParser()
@@ -60,6 +64,26 @@ def parse_arg():
         action="store_true", 
         help="Train the model"
     )
+    # Data-parallel training
+    parser.add_argument(
+        "--WORKERS", 
+        type=int, 
+        default=1, 
+        help="Number of data-parallel (CPU) training processes"
+    )
+    # Asynchronous (Hogwild) training
+    parser.add_argument(
+        "--HOGWILD", 
+        action="store_true", 
+        help="Lock-free asynchronous training with --WORKERS processes"
+    )
+    # Autotuning
+    parser.add_argument(
+        "--AUTOTUNE", 
+        action="store_true", 
+        help="Train with the fastest thread count & batch size for this CPU "
+             "host (swept once, then cached)"
+    )
     # Testing
     parser.add_argument(
         "--TEST", 
@@ -72,7 +96,42 @@ def parse_arg():
         action="store_true", 
         help="View inferences"
     )
-    if len(sys.argv) is 1:
+    # Parity report
+    parser.add_argument(
+        "--PARITY", 
+        choices=['precision', 'int8', 'export'], 
+        help="Accuracy parity report (against fp32) for a loaded model"
+    )
+    # TorchScript/ONNX export
+    parser.add_argument(
+        "--EXPORT", 
+        metavar='name', 
+        type=str, 
+        help="Export a loaded model as <name>.pt (TorchScript) & <name>.onnx, "
+             "then check its parity"
+    )
+    # Profiling
+    parser.add_argument(
+        "--PROFILE", 
+        metavar='trace file', 
+        type=str, 
+        help="Profile time/FLOPs/bytes per layer & phase, save a Chrome trace (JSON)"
+    )
+    # Pruning
+    parser.add_argument(
+        "--PRUNE", 
+        action="store_true", 
+        help="Magnitude prune a loaded model (then fine-tune with --TRAIN, "
+             "or save a sparse copy)"
+    )
+    # Quantized copy
+    parser.add_argument(
+        "--QUANTIZE", 
+        metavar='model file', 
+        type=str, 
+        help="Save an int8, inference only copy of a loaded model"
+    )
+    if len(sys.argv) == 1:
         parser.print_help()
         sys.exit(1)	
 
@@ -9,9 +9,9 @@ from __future__ import print_function
 
 import math
 import sys
+import warnings
 
 import torch
-from bokeh.plotting import figure, output_file, show
 
 # Custom imports
 from libs.check_args import arguments, using_gpu
@@ -21,8 +21,11 @@ from configs.config_model import configs
 
 from data import dataset as dset
 
+# Layers owning a (weight, bias) pair
+PARAM_LAYERS = ('Linear', 'BatchNorm')
 
-def normalize(data, data_size):
+
+def normalize(data, data_size, out=None):
     """ Normalizes the given data with 
     mean and standard deviation """
     # flatten
@@ -30,14 +33,129 @@ def normalize(data, data_size):
     mean = torch.mean(data, 1, keepdim=True)
     std_deviation = torch.std(data, 1, keepdim=True)
     # print mean, std_deviation  
-    data = data - mean
-    data = data / std_deviation
+    data = torch.sub(data, mean, out=out)
+    data /= std_deviation
     return data
 
 
-def batch_norm():
-    """ TBD """
-    pass
+def batch_norm(data, gamma, beta, eps=1e-5, out=None):
+    """ Normalizes the given batch per feature with its 
+    mean and variance, then scales & shifts it """
+    mean = torch.mean(data, 0, keepdim=True)
+    var = torch.var(data, 0, unbiased=False, keepdim=True)
+    data = torch.sub(data, mean, out=out)
+    data *= torch.rsqrt(var + eps)
+    return data.mul_(gamma).add_(beta)
+
+
+def fold_batch_norm(layers):
+    """ Inference copy of <layers>, each BatchNorm folded into the 
+    adjacent LinearLayer (preceding, else following) as 
+    w * s, (b - mean) * s + beta with s = gamma / sqrt(var + eps) """
+    folded, pending = [], None  # (scale, shift) waiting for the next Linear
+    for lth, layer in enumerate(layers):
+        if layer.LayerName == 'BatchNorm':
+            scale, shift = layer.scale_shift()
+            if folded and folded[-1].LayerName == 'Linear':
+                linear = folded[-1]
+                folded[-1] = LinearLayer.from_params(linear.w * scale, 
+                                                     linear.b * scale + shift)
+            else:
+                pending = scale, shift
+            continue
+        if pending is not None:
+            if layer.LayerName != 'Linear':
+                raise ValueError("BatchNorm before layer %d has no adjacent Linear layer" % lth)
+            # (x * s + t) w + b
+            scale, shift = pending
+            layer = LinearLayer.from_params(layer.w * scale.t(), 
+                                            torch.addmm(layer.b, shift, layer.w))
+            pending = None
+        folded.append(layer)
+    return folded
+
+
+def to_csr(w):
+    """ Compressed sparse row copy of <w> [num_ipt x num_opt], transposed 
+    (a row per output neuron) for sparse_linear """
+    with warnings.catch_warnings():  # Sparse CSR tensors are in beta
+        warnings.simplefilter('ignore')
+        csr = w.t().contiguous().to_sparse_csr()
+        # 32 bit indices
+        return torch.sparse_csr_tensor(csr.crow_indices().int(), csr.col_indices().int(), 
+                                       csr.values(), csr.size())
+
+
+def sparse_linear(csr, ipt, b, out=None):
+    """ x w + b with w stored as to_csr(w). The product is [num_opt x 
+    batch_size]: written straight into <out> if it is the transpose of 
+    such a buffer (Arena.new_t), else computed aside and copied """
+    if out is not None and out.t().is_contiguous():
+        torch.addmm(b.t(), csr, ipt.t(), out=out.t())
+        return out
+    output = torch.addmm(b.t(), csr, ipt.t()).t()
+    return output if out is None else out.copy_(output)
+
+
+def quantize_per_channel(w):
+    """ Symmetric int8 quantization of <w> [num_ipt x num_opt], 
+    one scale per output neuron: w ~ q * scale """
+    scale = torch.max(torch.abs(w), 0, keepdim=True)[0].clamp_(min=1e-12).div_(127)
+    q = torch.round(w / scale).to(torch.int8)
+    return q, scale
+
+
+class Int8Linear(object):
+    """ Inference time x (q * scale) + b for int8 weights <q>: fbgemm's 
+    dynamic quantized kernel if available, else dequantized on the fly 
+    a block of output neurons at a time """
+
+    block_size = 256
+
+    def __init__(self, q, scale, b):
+        self.q, self.scale, self.b = q, scale, b
+        self.packed = None
+        if not q.is_cuda and 'fbgemm' in torch.backends.quantized.supported_engines:
+            with warnings.catch_warnings():  # Quantized tensor API deprecation
+                warnings.simplefilter('ignore')
+                qweight = torch.quantize_per_channel(
+                    (q.float() * scale).t().contiguous(), scale.view(-1).double(), 
+                    torch.zeros(q.size(1)).long(), 0, torch.qint8)
+                self.packed = torch.ops.quantized.linear_prepack(qweight, b.view(-1))
+        else:
+            self.block = torch.zeros(q.size(0), min(self.block_size, q.size(1))).type_as(b)
+
+    def __call__(self, ipt, out):
+        if self.packed is not None:
+            return out.copy_(torch.ops.quantized.linear_dynamic(ipt, self.packed))
+        # (x q) * scale + b
+        width = self.block.size(1)
+        for start in range(0, self.q.size(1), width):
+            q = self.q[:, start:start + width]
+            w = self.block[:, :q.size(1)]
+            out[:, start:start + q.size(1)] = torch.mm(ipt, w.copy_(q))
+        return torch.addcmul(self.b, out, self.scale, out=out)
+
+
+def fold_input_norm(layers, mean, std):
+    """ Inference copy of <layers> with an affine input normalization 
+    (x - mean) / std folded into the first LinearLayer (<mean>, <std>: 
+    scalars or [1 x num_inputs]) """
+    linear = layers[0]
+    scale = torch.ones(1, linear.ipt_neurons).type_as(linear.w) / std
+    shift = -mean * scale
+    return [LinearLayer.from_params(linear.w * scale.t(), 
+        torch.addmm(linear.b, shift.expand(1, linear.ipt_neurons), linear.w))] + list(layers[1:])
+
+
+def fold_layers(model):
+    """ Inference copy of the layers of <model>, BatchNorm and 
+    dataset input normalization folded into the Linear layers """
+    layers = fold_batch_norm(model.layers)
+    if model.input_norm == 'dataset':
+        layers = fold_input_norm(layers, model.input_mean.type_as(layers[0].w), 
+                                 model.input_std.type_as(layers[0].w))
+    return layers
 
 
 class ModelNN(object):
@@ -58,13 +176,34 @@ class ModelNN(object):
          self.output, self.loss] = [], [], [], 0
         self.grad_weights, self.grad_biases, \
         self.grad_output = [], [], []
+        # Per parameter: under L2 regularization or not 
+        # (Linear weights are, BatchNorm's scale is not)
+        self.regularized = []
         # Hyper parameters
         self.lr_policy = ""
         self.weights_decay = self.epochs = \
             self.lr = self.decay_rate = 1
+        self.batch_size = dset.CIFAR10.batch_size
+        # Micro-batches summed per update, and summed so far
+        self.accum_steps, self.accumulated = 1, 0
+        # Training batches prepared ahead (0: in line, see data.dataset.Prefetcher)
+        self.prefetch = 0
+        # Input normalization: per image ('sample') or with the training 
+        # set's statistics ('dataset', see set_input_norm)
+        self.input_norm = 'sample'
+        self.input_mean = self.input_std = self.input_scale = self.input_shift = None
+        # Pruning masks (None: dense), Linear layers at least 
+        # <sparse_at> sparse run sparse matmuls at inference
+        self.masks, self.sparse_at = [], None
+        # Parameter updates so far (see sync_compute_params)
+        self.updates = 0
         self.reg = 1e-3  # regularization strength
+        self.solver = 'sgd'
+        self.momentum, self.betas, self.eps = 0.9, (0.9, 0.999), 1e-8
+        self.optimizer = None
         # Results
-        self.predictions = self.train_acc = self.test_acc = 0
+        self.predictions = self.confidences = \
+            self.train_acc = self.test_acc = 0
         self.data_set = ""
         self.optimum = {
             'Fitting tested': self.fitted, 'Trained': self.trained, 'Tested': self.tested,
@@ -77,6 +216,17 @@ class ModelNN(object):
         }
         # Model running in mode
         self.isTrain = False
+        # Compiled execution plans & arenas, per batch size (see compile)
+        self.target, self.arena, self.plans = None, None, {}
+        # Compute precision, fp32 master weights (see set_precision)
+        self.precision, self.loss_scale, self.good_steps = 'float32', 1., 0
+        self.compute_weights, self.compute_biases = [], []
+        self.compute_grad_weights, self.compute_grad_biases = [], []
+        # int8 (weight, scale) pairs, inference only
+        self.quantized = []
+        # Times the plan steps if set (see libs.profiler)
+        self.profiler = None
+        self.input_step, self.train_plan, self.test_plan, self.backward_plan = None, [], [], []
 
     def show_log(self, arch=False, fit=False, train=False, test=False, infer=False, curr_status=None):
         """ Print out stats of the current activity """
@@ -102,8 +252,13 @@ class ModelNN(object):
         if fit or train:
             print('( DATASET: %s )' % self.data_set, end="\n ")
             print('TYPE:', self.model_type, '\n', 'NUM-LAYERS:', self.num_layers, '\n',
-                  'EPOCHS:', self.epochs, '\n', 'L.R.:', self.lr, '\n',
-                  'LR-POLICY:', self.lr_policy, '\n', 'WEIGHTS-DECAY:', self.weights_decay, '\n',
+                  'EPOCHS:', self.epochs, '\n', 'BATCH-SIZE:', self.batch_size, '\n',
+                  'ACCUM-STEPS:', self.accum_steps, '\n',
+                  'PREFETCH:', self.prefetch, '\n',
+                  'INPUT-NORM:', self.input_norm, '\n',
+                  'L.R.:', self.lr, '\n',
+                  'LR-POLICY:', self.lr_policy, '\n', 'SOLVER:', self.solver, '\n',
+                  'WEIGHTS-DECAY:', self.weights_decay, '\n',
                   'DECAY-RATE:', self.decay_rate, '\n', 'REG-STRENGTH:', self.reg, '\n',
                   'LOSS:', self.optimum['Loss'], end=" }\n\n")
 
@@ -118,6 +273,9 @@ class ModelNN(object):
             [self.model_type, self.num_layers, self.arch,
              self.layers, self.epochs, self.lr_policy,
              self.weights_decay, self.decay_rate, self.reg]
+        self.optimum['Masks'] = self.masks
+        self.optimum['Input norm'], self.optimum['Input mean'], self.optimum['Input std'] = \
+            self.input_norm, self.input_mean, self.input_std
 
     def get_logs(self):
         cfg = configs()
@@ -128,6 +286,10 @@ class ModelNN(object):
             self.optimum['Learning rate'], self.optimum['L.R. decay'])
         self.model_type = cfg["MODEL"]["TYPE"]
         self.weights_decay = cfg["SOLVER"]["WEIGHT_DECAY"]
+        self.solver = cfg["SOLVER"]["TYPE"]
+        self.momentum, self.betas, self.eps = (cfg["SOLVER"]["MOMENTUM"], 
+            tuple(cfg["SOLVER"]["BETAS"]), cfg["SOLVER"]["EPS"])
+        self.set_precision(cfg["PRECISION"]["COMPUTE"], cfg["PRECISION"]["LOSS_SCALE"])
         if arguments().FIT:
             mode = "FIT"
         elif arguments().TRAIN:
@@ -137,44 +299,185 @@ class ModelNN(object):
             if not self.optimum['Trained']:
                 self.lr = cfg[mode]["BASE_LR"]
                 self.optimum['Loss'] = self.loss = float("inf")
+            self.prefetch = cfg[mode]["PREFETCH"]
         # Constant params
         if arguments().FIT or arguments().TRAIN:
             self.lr_policy = cfg[mode]["LR_POLICY"]
             self.decay_rate = cfg[mode]["DECAY_RATE"]
             self.epochs = cfg[mode]["EPOCHS"]
+            self.batch_size = cfg[mode]["BATCH_SIZE"]
+            self.accum_steps = cfg[mode]["ACCUM_STEPS"]
         # For all model working modes
         [self.weights, self.biases] = (self.optimum['Weights'], 
             self.optimum['Biases'])
+        self.masks = self.optimum.get('Masks', [])
+        # Normalized as when it was trained (per image before 'Input norm')
+        self.set_input_norm(self.optimum.get('Input norm', 'sample'), 
+                            self.optimum.get('Input mean'), self.optimum.get('Input std'))
         # Set layer weights and biases (for fprop)
         i = 0
+        self.regularized = []
         for layer in self.layers:
-            if layer.LayerName == 'Linear':
+            if layer.LayerName in PARAM_LAYERS:
                 layer.w = self.optimum['Weights'][i]
                 layer.b = self.optimum['Biases'][i]
+                self.regularized.append(layer.LayerName == 'Linear')
                 i += 1
+        # Layer objects were swapped in, rebuild the plan
+        self.reset_plans()
+        self.compile(self.batch_size)
 
     def update_parameters(self):
-        """ Bias and weight updates """
-        for i, (grad_ws, grad_bs) in enumerate(zip(self.grad_weights, self.grad_biases)):
-            grad_ws += self.reg * self.weights[i]
-            self.weights[i] += (-self.lr * grad_ws)
-            self.biases[i] += (-self.lr * grad_bs)
+        """ Bias and weight updates (plain SGD, unless an 
+        Optimize object attached its own update rule), 
+        from the mean of the micro-batch gradients summed so far """
+        if not self.unscale_gradients():
+            return
+        if self.optimizer is not None:
+            self.optimizer.update()
+        else:
+            for i, (grad_ws, grad_bs) in enumerate(zip(self.grad_weights, self.grad_biases)):
+                if self.regularized[i]:
+                    grad_ws.add_(self.weights[i], alpha=self.reg)
+                self.weights[i].add_(grad_ws, alpha=-self.lr)
+                self.biases[i].add_(grad_bs, alpha=-self.lr)
+        # Pruned weights stay pruned
+        for w, mask in zip(self.weights, self.masks):
+            if mask is not None:
+                w.mul_(mask)
+        self.sync_compute_params()
+
+    def prune(self, sparsity):
+        """ Zero the <sparsity> fraction of smallest magnitude weights 
+        of every Linear layer; the masks keep them zero while training """
+        self.masks = []
+        for layer in self.layers:
+            if layer.LayerName not in PARAM_LAYERS:
+                continue
+            if layer.LayerName != 'Linear':
+                self.masks.append(None)
+                continue
+            magnitudes = torch.abs(layer.w)
+            num_pruned = int(sparsity * magnitudes.numel())
+            if num_pruned:
+                threshold = torch.kthvalue(magnitudes.view(-1), num_pruned)[0]
+                mask = magnitudes > threshold
+            else:
+                mask = torch.ones_like(magnitudes).bool()
+            layer.w.mul_(mask)
+            self.masks.append(mask)
+        self.reset_plans()
+
+    def sparsity(self, param):
+        """ Fraction of zero weights of parameter <param> """
+        w = self.weights[param]
+        return 1. - float(torch.count_nonzero(w)) / w.numel()
+
+    def set_input_norm(self, mode='sample', mean=None, std=None):
+        """ Normalize inputs per image ('sample'), or as (x - mean) / std 
+        with dataset statistics ('dataset'): <mean>, <std> per channel 
+        or per input [1 x num_inputs] """
+        self.input_norm = mode
+        # Compiled input steps read the statistics
+        self.reset_plans()
+        if mode != 'dataset':
+            self.input_mean = self.input_std = self.input_scale = self.input_shift = None
+            return
+        num_inputs = 32 * 32 * 3
+
+        def per_input(stat):
+            stat = torch.as_tensor(stat, dtype=torch.float32).cpu().view(-1, 1)
+            return stat.expand(-1, num_inputs // stat.size(0)).reshape(1, num_inputs)
+
+        self.input_mean, self.input_std = per_input(mean), per_input(std)
+        # Fused x * scale + shift
+        self.input_scale = (1. / self.input_std).type(default_tensor_type())
+        self.input_shift = (-self.input_mean / self.input_std).type(default_tensor_type())
+
+    def set_precision(self, precision='float32', loss_scale=1.):
+        """ Run the matmuls in <precision> ('float32', 'bfloat16' or 
+        'float16'), keeping fp32 master weights & loss. Gradients 
+        are scaled by <loss_scale> (float16 only). 'int8' runs the 
+        Linear layers on int8 weights, for inference only """
+        self.precision = precision
+        self.loss_scale = float(loss_scale) if precision == 'float16' else 1.
+        self.good_steps = 0
+        self.reset_plans()
+
+    def init_compute_params(self):
+        """ Low precision copies of the parameters & gradients 
+        for the matmuls (the fp32 ones when in fp32) """
+        if self.precision in ('float32', 'int8'):
+            self.compute_weights, self.compute_biases = self.weights, self.biases
+            self.compute_grad_weights, self.compute_grad_biases = \
+                self.grad_weights, self.grad_biases
+            if self.precision == 'int8':
+                self.quantized = [quantize_per_channel(w) for w in self.weights]
+            return
+        dtype = getattr(torch, self.precision)
+        self.compute_weights = [w.to(dtype) for w in self.weights]
+        self.compute_biases = [b.to(dtype) for b in self.biases]
+        self.compute_grad_weights = [w.clone() for w in self.compute_weights]
+        self.compute_grad_biases = [b.clone() for b in self.compute_biases]
+
+    def sync_compute_params(self):
+        """ Refresh the low precision copies from the master weights 
+        (which were updated) """
+        self.updates += 1
+        if self.compute_weights is self.weights:
+            return
+        for p_c, p in zip(self.compute_weights + self.compute_biases, 
+                          self.weights + self.biases):
+            p_c.copy_(p)
+
+    def unscale_gradients(self):
+        """ Undo loss scaling and micro-batch summation (one pass); 
+        on overflow, skip the update and back off """
+        grads = self.grad_weights + self.grad_biases
+        scale = self.loss_scale * max(self.accumulated, 1)
+        self.accumulated = 0
+        if scale == 1:
+            return True
+        if self.loss_scale != 1:
+            for grad in grads:
+                total = float(torch.sum(grad))
+                if math.isnan(total) or math.isinf(total):
+                    self.loss_scale /= 2
+                    self.good_steps = 0
+                    return False
+        for grad in grads:
+            grad.div_(scale)
+        if self.loss_scale == 1:
+            return True
+        self.good_steps += 1
+        if self.good_steps == 1000:
+            self.loss_scale *= 2
+            self.good_steps = 0
+        return True
 
     def parameters(self):
         return [self.weights, self.biases]
 
+    def stats(self):
+        """ Running statistics of the layers (not updated by the solver) """
+        return [stat for layer in self.layers if layer.LayerName == 'BatchNorm'
+                for stat in (layer.running_mean, layer.running_var)]
+
     def add(self, layer_obj):
         """ Add layers, activations to the nn architecture """
         self.layers.append(layer_obj)
-        if layer_obj.LayerName == 'Linear':
-            layer_obj.w *= self.weights_decay
+        if layer_obj.LayerName in PARAM_LAYERS:
+            if layer_obj.LayerName == 'Linear':
+                layer_obj.w *= self.weights_decay
             self.weights.append(layer_obj.w)
             self.biases.append(layer_obj.b)
-            self.grad_weights.append(0)
-            self.grad_biases.append(0)
+            self.regularized.append(layer_obj.LayerName == 'Linear')
+            self.grad_weights.append(layer_obj.w.clone().zero_())
+            self.grad_biases.append(layer_obj.b.clone().zero_())
         self.output.append(0)
         self.grad_output.append(0)
         self.num_layers += 1
+        self.reset_plans()
         self.patch_arch(layer_obj)
 
     def patch_arch(self, l):
@@ -182,6 +485,8 @@ class ModelNN(object):
         self.arch += str(self.num_layers) + ': ' + l.LayerName
         if l.LayerName == 'Linear':
             self.arch += '( ' + str(l.ipt_neurons) + ' x ' + str(l.opt_neurons) + ' )'
+        elif l.LayerName == 'BatchNorm':
+            self.arch += '( ' + str(l.opt_neurons) + ' )'
         elif l.LayerName == 'Activation':
             self.arch += '( ' + l.activation + ' )'
         elif l.LayerName == 'Criterion':
@@ -196,85 +501,169 @@ class ModelNN(object):
         print(self.arch, end="")
         print('\t  }')
 
+    def compile(self, batch_size, backward=True):
+        """ Compile the layer list into flat fprop/bprop plans of
+        bound callables writing into an arena for <batch_size> 
+        (inference only, without gradient buffers, if not <backward>) """
+        if not self.compute_weights:
+            self.init_compute_params()
+        if self.precision == 'int8':  # Inference only
+            backward = False
+        dtype = None if self.precision in ('float32', 'int8') else getattr(torch, self.precision)
+        arena = Arena(batch_size, self.num_layers, self.layers[0].ipt_neurons, dtype)
+        # Parameter index of each layer
+        params, param = [], 0
+        for layer in self.layers:
+            params.append(param)
+            if layer.LayerName in PARAM_LAYERS:
+                param += 1
+        input_step = self.plan_input(arena)
+        train_plan, test_plan, backward_plan = [], [], []
+        profiler = self.profiler
+        for lth, layer in enumerate(self.layers):
+            allocated = arena.allocated
+            fprop, infer = layer.plan_fprop(self, arena, lth, params[lth])
+            if profiler is not None:
+                allocated = arena.allocated - allocated
+                fprop = profiler.wrap(self, arena, lth, 'forward', fprop, allocated)
+                infer = profiler.wrap(self, arena, lth, 'forward', infer, allocated)
+            train_plan.append(fprop)
+            test_plan.append(infer)
+        if not backward:
+            self.plans[batch_size] = (arena, input_step, train_plan, test_plan, None)
+            return self.plans[batch_size]
+        for lth in range(self.num_layers - 1, -1, -1):
+            allocated = arena.allocated
+            bprop = self.layers[lth].plan_bprop(self, arena, lth, params[lth])
+            if bprop is not None:
+                if profiler is not None:
+                    bprop = profiler.wrap(self, arena, lth, 'backward', bprop, 
+                                          arena.allocated - allocated)
+                backward_plan.append(bprop)
+        self.plans[batch_size] = (arena, input_step, train_plan, test_plan, backward_plan)
+        return self.plans[batch_size]
+
+    def reset_plans(self):
+        """ Drop compiled plans, arenas & compute copies 
+        (layers, parameters or precision changed) """
+        self.plans = {}
+        self.compute_weights, self.compute_biases = [], []
+
+    def use_plan(self, batch_size, backward=True):
+        """ Switch to the plan (and arena) compiled for <batch_size> """
+        plan = self.plans.get(batch_size)
+        if plan is None or (backward and plan[4] is None):
+            if backward and self.precision == 'int8':
+                raise ValueError("int8 precision is for inference only")
+            plan = self.compile(batch_size, backward)
+        (self.arena, self.input_step, self.train_plan, 
+         self.test_plan, self.backward_plan) = plan
+        self.output, self.grad_output = self.arena.output, self.arena.grad_output
+
     def train(self, ipt, label):
-        """ Fprop and Backprop to train """
+        """ Fprop and Backprop to train, updating the 
+        parameters once every <accum_steps> micro-batches """
+        self.compute_gradients(ipt, label)
+        if self.accumulated >= self.accum_steps:
+            self.update_parameters()
+
+    def compute_gradients(self, ipt, label):
+        """ Fprop and Backprop, without the parameter update 
+        (gradients summed into those of earlier micro-batches) """
         self.isTrain = True
-        ipt = normalize(ipt, ipt.size(0))
-        self.forward(ipt, label)
-        self.backward(ipt, label)
+        self.use_plan(ipt.size(0))
+        self.normalize_input(ipt)
+        self.target = label
+        for step in self.train_plan:
+            step()
+        for step in self.backward_plan:
+            step()
+        self.accumulated += 1
+
+    def training_loss(self, ipt, label):
+        """ Training mode loss (batch statistics, L2 term) of the current 
+        parameters: fprop only, BatchNorm running statistics left as they were """
+        self.isTrain = True
+        self.use_plan(ipt.size(0), backward=False)
+        stats = [stat.clone() for stat in self.stats()]
+        self.normalize_input(ipt)
+        self.target = label
+        for step in self.train_plan:
+            step()
+        for stat, saved in zip(self.stats(), stats):
+            stat.copy_(saved)
 
     def test(self, ipt, target):
         """ Fprop to test torche model """
         self.isTrain = False
-        self.forward(normalize(ipt, ipt.size(0)), target)
+        self.use_plan(ipt.size(0), backward=False)
+        self.normalize_input(ipt)
+        self.target = target
+        for step in self.test_plan:
+            step()
+
+    def normalize_input(self, ipt):
+        """ Normalized <ipt> into the arena (see plan_input) """
+        self.input_step(ipt)
+
+    def plan_input(self, arena):
+        """ Input step of a plan: per image normalization, or with the 
+        dataset statistics in one fused multiply-add """
+        out = arena.ipt
+        if self.input_norm != 'dataset':
+            def input_step(ipt):
+                normalize(ipt, ipt.size(0), out=out)
+
+            return input_step
+
+        shift, scale = self.input_shift, self.input_scale
+
+        def input_step(ipt):
+            torch.addcmul(shift, ipt.view(ipt.size(0), -1), scale, out=out)
+
+        return input_step
 
     def forward(self, ipt, label):
         """ Fprop for sequential NN layers """
-        for lth in range(self.num_layers):
-            if lth == 0:  # Input layer
-                if self.layers[lth].LayerName == 'Linear':
-                    self.output[lth] = self.layers[lth].forward(ipt)
-            elif lth < self.num_layers - 1:  # Hidden layers
-                if self.layers[lth].LayerName == 'Linear':
-                    self.output[lth] = \
-                        (self.layers[lth].forward(self.output[lth - 1]))
-                elif self.layers[lth].LayerName == 'Activation':
-                    if self.layers[lth].activation == 'ReLU':
-                        self.output[lth] = \
-                            (self.layers[lth].relu(self.output[lth - 1]))
-            else:  # Last layer
-                if self.isTrain:
-                    if self.layers[lth].LayerName == 'Criterion':
-                        if self.layers[lth].classifier == 'Softmax':
-                            _, _, self.output[lth] = \
-                                (self.layers[lth].softmax(self.output[lth - 1]))
-                else:
-                    if self.layers[lth].LayerName == 'Criterion':
-                        self.output[lth], self.predictions, _ = \
-                            (self.layers[lth].softmax(self.output[lth - 1]))
-                self.CELoss(self.output[lth], label)
+        self.use_plan(ipt.size(0))
+        self.arena.ipt.copy_(ipt)
+        self.target = label
+        for step in (self.train_plan if self.isTrain else self.test_plan):
+            step()
 
     def backward(self, ipts, targets):
         """ Backprop for sequential NN layers """
-        param = len(self.weights) - 1
-        for lth in range(self.num_layers - 1, -1, -1):
-            if lth == self.num_layers - 1:  # Last layer
-                if self.layers[lth].LayerName == 'Criterion':
-                    if self.layers[lth].classifier == 'Softmax':
-                        self.grad_output[lth] = \
-                            (self.layers[lth].backward_softmax(self.output[lth], targets))
-            elif self.num_layers - 1 > lth > 0:  # Hidden layers
-                if self.layers[lth].LayerName == 'Linear':
-                    self.grad_weights[param], self.grad_biases[param] = (
-                        self.layers[lth].backward(self.output[lth - 1], self.grad_output[lth + 1]))
-                    self.grad_output[lth] = \
-                        (self.layers[lth].backward(self.weights[param], self.grad_output[lth + 1], 1))
-                    param -= 1
-                elif self.layers[lth].LayerName == 'Activation':
-                    if self.layers[lth].activation == 'ReLU':
-                        self.grad_output[lth] = \
-                            (self.layers[lth].backward_relu(self.output[lth], self.grad_output[lth + 1]))
-            else:
-                self.grad_weights[0], self.grad_biases[0] = \
-                    (self.layers[0].backward(ipts, self.grad_output[1]))
+        self.use_plan(ipts.size(0))
+        self.target = targets
+        for step in self.backward_plan:
+            step()
+        self.accumulated += 1
         self.update_parameters()
 
-    def CELoss(self, softmax, targets):
+    def CELoss(self, softmax, targets, log_base=10):
         """ Cross-entropy loss """
+        batch_size = softmax.size(0)
         if self.isTrain:
-            correct_log_probs = (-(torch.log(softmax[range(dset.CIFAR10.batch_size), targets])
-                                   / torch.log(torch.Tensor([10]).type(default_tensor_type()))))
+            correct_log_probs = -torch.log(softmax[range(batch_size), targets])
             # print correct_log_probs
-            self.loss = torch.sum(correct_log_probs) / dset.CIFAR10.batch_size
-            weights = self.parameters()
+            loss = torch.sum(correct_log_probs) / batch_size
+        else:
+            probs = -torch.log(softmax)
+            loss = torch.sum(probs) / batch_size
+        if log_base:
+            loss /= math.log(log_base)
+        self.set_loss(loss)
+
+    def set_loss(self, loss):
+        """ Set the loss, regularized while training """
+        self.loss = float(loss)
+        if self.isTrain:
             reg_loss = 0
-            for w in weights[0]:
-                reg_loss += 0.5 * self.reg * torch.sum(w * w)
+            for w, regularized in zip(self.weights, self.regularized):
+                if regularized:
+                    w = w.view(-1)
+                    reg_loss += 0.5 * self.reg * float(torch.dot(w, w))
             self.loss += reg_loss
-        else:
-            probs = -((torch.log(softmax) / 
-                    torch.log(torch.Tensor([10]).type(default_tensor_type()))))
-            self.loss = torch.sum(probs) / dset.CIFAR10.test_size
         # If fitting/training/testing loss is destroyed.    
         if math.isnan(self.loss):
             # Quit if loss is NaN.
@@ -285,6 +674,8 @@ class ModelNN(object):
 
     def plot_loss(self, loss_type):
         """ Plot gradient descent curve """
+        from bokeh.plotting import figure, output_file, show
+
         output_file("outputs/loss_plots/output_file.html")
         p = figure(title=loss_type, x_axis_label="Num epochs", 
                 y_axis_label="Loss")
@@ -293,10 +684,44 @@ class ModelNN(object):
         show(p)
 
 
+class Arena(object):
+    """ Activation/gradient buffers allocated once per 
+    (batch size, architecture); layers write into them in place """
+
+    def __init__(self, batch_size, num_layers, ipt_size, dtype=None):
+        self.batch_size = batch_size
+        self.dtype = dtype  # Compute dtype (None: default tensor type)
+        self.allocated = 0  # Bytes
+        self.ipt = self.new(ipt_size)
+        self.output = [0] * num_layers
+        self.grad_output = [0] * num_layers
+        # Per layer fprop results needed by bprop
+        self.saved = {}
+
+    def new(self, size, dtype=None):
+        """ Allocate a [batch_size x size] buffer 
+        (in compute dtype, unless <dtype> is given) """
+        buf = torch.zeros(self.batch_size, size).type(default_tensor_type())
+        dtype = dtype or self.dtype
+        buf = buf if dtype is None else buf.to(dtype)
+        self.allocated += buf.numel() * buf.element_size()
+        return buf
+
+    def new_t(self, size):
+        """ A [batch_size x size] view of a [size x batch_size] buffer, 
+        for layers computing their output transposed """
+        buf = torch.zeros(size, self.batch_size).type(default_tensor_type())
+        buf = buf if self.dtype is None else buf.to(self.dtype)
+        self.allocated += buf.numel() * buf.element_size()
+        return buf.t()
+
+
 class LinearLayer(ModelNN):
     """Linear Layer class"""
 
     LayerName = 'Linear'
+    # Sparse (to_csr) weights for forward, if set
+    csr = None
 
     def __init__(self, num_ipt_neurons, num_opt_neurons):
         # print 'Linear layer created'
@@ -307,20 +732,212 @@ class LinearLayer(ModelNN):
         self.w = torch.rand(num_ipt_neurons, num_opt_neurons).type(default_tensor_type())
         self.b = torch.zeros(1, num_opt_neurons).type(default_tensor_type())
 
-    def forward(self, ipt, target=None):
-        # Frop the linear layer
-        output = torch.mm(ipt, self.w) + self.b
+    @classmethod
+    def from_params(cls, w, b):
+        """ Linear layer with the given (e.g. folded) parameters """
+        layer = cls.__new__(cls)
+        super(LinearLayer, layer).__init__()
+        layer.ipt_neurons, layer.opt_neurons = w.size()
+        layer.w, layer.b = w, b
+        return layer
+
+    def sparsify(self):
+        """ Forward through a sparse copy of the (pruned) weights """
+        self.csr = to_csr(self.w)
+
+    def forward(self, ipt, target=None, out=None):
+        # Frop the linear layer (bias fused in the matmul)
+        if self.csr is not None:
+            return sparse_linear(self.csr, ipt, self.b, out=out)
+        output = torch.addmm(self.b, ipt, self.w, out=out)
         return output
 
-    def backward(self, ipt, grad_output, i=-1):
-        # Backprop the linear layer
+    def backward(self, ipt, grad_output, i=-1, out=None, accumulate=False):
+        # Backprop the linear layer (summed into <out> if <accumulate>)
         if i == -1:
-            grad_w = torch.mm(ipt.t(), grad_output)
-            grad_b = torch.sum(grad_output, dim=0, keepdim=True)
+            grad_w, grad_b = out if out is not None else (None, None)
+            if accumulate:
+                grad_w = torch.addmm(grad_w, ipt.t(), grad_output, out=grad_w)
+                grad_b = grad_b.add_(torch.sum(grad_output, dim=0, keepdim=True))
+                return [grad_w, grad_b]
+            grad_w = torch.mm(ipt.t(), grad_output, out=grad_w)
+            grad_b = torch.sum(grad_output, dim=0, keepdim=True, out=grad_b)
             return [grad_w, grad_b]
-        grad_output = torch.mm(grad_output, ipt.t())
+        grad_output = torch.mm(grad_output, ipt.t(), out=out)
         return grad_output
 
+    def plan_fprop(self, model, arena, lth, param):
+        """ Fprop step of layer <lth> owning parameter <param> """
+        src = arena.output[lth - 1] if lth else arena.ipt
+        # Parameters in compute precision
+        w, b = model.compute_weights[param], model.compute_biases[param]
+        sparse = (model.precision == 'float32' and model.sparse_at is not None 
+                  and model.sparsity(param) >= model.sparse_at)
+        if sparse:
+            # Output kept transposed, the sparse matmul's layout
+            out = arena.output[lth] = arena.new_t(self.opt_neurons)
+        else:
+            out = arena.output[lth] = arena.new(self.opt_neurons)
+
+        if model.precision == 'int8':
+            linear = Int8Linear(*(model.quantized[param] + (b,)))
+
+            def infer():
+                linear(src, out)
+
+            return infer, infer
+
+        if not sparse:
+            def fprop():
+                torch.addmm(b, src, w, out=out)
+
+            return fprop, fprop
+
+        # (x w + b)' = w' x' + b', into the transposed buffer
+        out_t = out.t()
+
+        def fprop():
+            torch.addmm(b.t(), w.t(), src.t(), out=out_t)
+
+        # Sparse copy, refreshed when the weights were updated
+        csr = [None, -1]
+
+        def infer():
+            if csr[1] != model.updates:
+                csr[:] = to_csr(w), model.updates
+            sparse_linear(csr[0], src, b, out=out)
+
+        return fprop, infer
+
+    def plan_bprop(self, model, arena, lth, param):
+        """ Bprop step of layer <lth> owning parameter <param> """
+        src = arena.output[lth - 1] if lth else arena.ipt
+        grad = arena.grad_output[lth + 1]
+        w = model.compute_weights[param]
+        grad_w, grad_b = model.compute_grad_weights[param], model.compute_grad_biases[param]
+        master_grads = model.grad_weights[param], model.grad_biases[param]
+        backward = self.backward
+
+        if grad_w is master_grads[0]:  # fp32, sum straight into the master grads
+            def param_grads():
+                backward(src, grad, out=(grad_w, grad_b), accumulate=model.accumulated)
+        else:
+            def param_grads():
+                backward(src, grad, out=(grad_w, grad_b))
+                # Accumulate in fp32
+                if model.accumulated:
+                    master_grads[0].add_(grad_w)
+                    master_grads[1].add_(grad_b)
+                else:
+                    master_grads[0].copy_(grad_w)
+                    master_grads[1].copy_(grad_b)
+
+        if lth == 0:  # Input layer, no gradient w.r.t. the input
+            return param_grads
+        # Hidden layers
+        out = arena.grad_output[lth] = arena.new(self.ipt_neurons)
+
+        def bprop():
+            param_grads()
+            backward(w, grad, 1, out=out)
+
+        return bprop
+
+
+class BatchNorm(ModelNN):
+    """Batch normalization layer class (per feature)"""
+
+    LayerName = 'BatchNorm'
+
+    def __init__(self, num_neurons, eps=1e-5, momentum=0.1):
+        super(BatchNorm, self).__init__()
+        self.ipt_neurons = self.opt_neurons = num_neurons
+        self.eps, self.momentum = eps, momentum
+        # Scale (gamma) & shift (beta)
+        self.w = torch.ones(1, num_neurons).type(default_tensor_type())
+        self.b = torch.zeros(1, num_neurons).type(default_tensor_type())
+        # Running statistics, for inference
+        self.running_mean = torch.zeros(1, num_neurons).type(default_tensor_type())
+        self.running_var = torch.ones(1, num_neurons).type(default_tensor_type())
+
+    def forward(self, ipt, target=None, out=None):
+        # Fprop the batchnorm layer (batch statistics)
+        return batch_norm(ipt, self.w, self.b, self.eps, out=out)
+
+    def scale_shift(self):
+        """ Inference time y = x * scale + shift, from the running statistics """
+        scale = self.w * torch.rsqrt(self.running_var + self.eps)
+        return scale, self.b - self.running_mean * scale
+
+    def plan_fprop(self, model, arena, lth, param):
+        """ Fprop step of layer <lth> owning parameter <param> """
+        src = arena.output[lth - 1] if lth else arena.ipt
+        out = arena.output[lth] = arena.new(self.opt_neurons)
+        # Normalized input, kept for bprop
+        x_hat = arena.new(self.opt_neurons)
+        w, b = model.compute_weights[param], model.compute_biases[param]
+        mean, var, inv_std, scale, shift = [
+            torch.zeros(1, self.opt_neurons).type_as(src) for _ in range(5)]
+        arena.saved[lth] = x_hat, inv_std
+        running_mean, running_var = self.running_mean, self.running_var
+        momentum, eps = self.momentum, self.eps
+        unbias = float(arena.batch_size) / max(arena.batch_size - 1, 1)
+
+        def fprop():
+            torch.mean(src, 0, keepdim=True, out=mean)
+            torch.sub(src, mean, out=x_hat)
+            torch.mul(x_hat, x_hat, out=out)
+            torch.mean(out, 0, keepdim=True, out=var)
+            torch.add(var, eps, out=inv_std).rsqrt_()
+            x_hat.mul_(inv_std)
+            torch.addcmul(b, x_hat, w, out=out)
+            running_mean.mul_(1 - momentum).add_(mean, alpha=momentum)
+            running_var.mul_(1 - momentum).add_(var, alpha=momentum * unbias)
+
+        def infer():
+            torch.add(running_var, eps, out=scale).rsqrt_().mul_(w)
+            torch.mul(running_mean, scale, out=shift)
+            torch.sub(b, shift, out=shift)
+            torch.addcmul(shift, src, scale, out=out)
+
+        return fprop, infer
+
+    def plan_bprop(self, model, arena, lth, param):
+        """ Bprop step of layer <lth> owning parameter <param> """
+        grad = arena.grad_output[lth + 1]
+        x_hat, inv_std = arena.saved[lth]
+        w = model.compute_weights[param]
+        grad_w, grad_b, coef = [
+            torch.zeros(1, self.opt_neurons).type_as(grad) for _ in range(3)]
+        master_grads = model.grad_weights[param], model.grad_biases[param]
+        out = arena.new(self.ipt_neurons)
+        batch_size = arena.batch_size
+
+        def param_grads():
+            torch.mul(grad, x_hat, out=out)
+            torch.sum(out, 0, keepdim=True, out=grad_w)
+            torch.sum(grad, 0, keepdim=True, out=grad_b)
+            # Accumulate in fp32
+            if model.accumulated:
+                master_grads[0].add_(grad_w)
+                master_grads[1].add_(grad_b)
+            else:
+                master_grads[0].copy_(grad_w)
+                master_grads[1].copy_(grad_b)
+
+        if lth == 0:  # Input layer, no gradient w.r.t. the input
+            return param_grads
+        arena.grad_output[lth] = out
+
+        def bprop():
+            param_grads()
+            # (grad - (x_hat * grad_w + grad_b) / B) * w / std
+            torch.addcmul(grad_b, x_hat, grad_w, out=out)
+            torch.add(grad, out, alpha=-1. / batch_size, out=out)
+            out.mul_(torch.mul(w, inv_std, out=coef))
+
+        return bprop
+
 
 class Activation(ModelNN):
     """ReLU Activation layer class"""
@@ -333,55 +950,212 @@ class Activation(ModelNN):
         self.activation = activate_func
 
     @staticmethod
-    def relu(ipt):
+    def relu(ipt, out=None):
         # print ipt
-        activation_relu = torch.clamp(ipt, min=0)
+        activation_relu = torch.clamp(ipt, min=0, out=out)
         # print activation_relu
         return activation_relu
 
     @staticmethod
     def backward_relu(ipt, grad_output):
-        grad_output[ipt <= 0] = 0
-        return grad_output
+        # Zero where the ReLU output <ipt> is not positive: one fused 
+        # pass, in place (the kernel behind torch's own ReLU backward)
+        return torch.ops.aten.threshold_backward.grad_input(grad_output, ipt, 0, 
+                                                            grad_input=grad_output)
+
+    def plan_fprop(self, model, arena, lth, param=None):
+        """ Fprop step of layer <lth>, in place over its input """
+        out = arena.output[lth] = arena.output[lth - 1]
+        activate = {
+            'ReLU': self.relu,
+        }[self.activation]
+
+        def fprop():
+            activate(out, out=out)
+
+        return fprop, fprop
+
+    def plan_bprop(self, model, arena, lth, param=None):
+        """ Bprop step of layer <lth>, in place over its gradient """
+        out = arena.output[lth]
+        grad = arena.grad_output[lth] = arena.grad_output[lth + 1]
+        backward = {
+            'ReLU': self.backward_relu,
+        }[self.activation]
+
+        def bprop():
+            backward(out, grad)
+
+        return bprop
 
 
 class CeCriterion(ModelNN):
     """Cross-entropy criterion"""
 
     LayerName = 'Criterion'
+    # Loss is reported in log base 10 (None: natural log)
+    log_base = 10
 
-    def __init__(self, classifier=None):
+    def __init__(self, classifier=None, log_base=10):
         super(CeCriterion, self).__init__()
         self.classifier = classifier
+        self.log_base = log_base
+
+    @staticmethod
+    def softmax(opt, out=None, norm=None):
+        opt_exp = torch.exp(opt, out=out)
+        softmax_func = opt_exp.div_(torch.sum(opt_exp, dim=1, keepdim=True, out=norm))
+        return softmax_func
 
     @staticmethod
-    def softmax(opt):
-        opt_exp = torch.exp(opt)
-        softmax_func = opt_exp / torch.sum(opt_exp, dim=1, keepdim=True)
-        value, index = torch.max(softmax_func, 1)
-        # print value, index
-        return [value, index.cpu(), softmax_func]
+    def log_softmax(opt, target, out=None, norm=None, top=None, log_base=None, picked=None):
+        """ Fused, stable cross-entropy from the logits: 
+        log-sum-exp (left in <norm>), mean loss and the softmax 
+        (left in <out> for backward_softmax) """
+        batch_size = opt.size(0)
+        value, index = torch.max(opt, 1, out=top)
+        softmax_func = torch.sub(opt, value.view(-1, 1), out=out).exp_()
+        norm = torch.sum(softmax_func, dim=1, keepdim=True, out=norm)
+        softmax_func.div_(norm)
+        # log(p_target) = opt_target - max - log(sum(exp(opt - max)))
+        # (labels may still be on the host)
+        picked = torch.gather(opt, 1, target.view(-1, 1).to(opt.device), out=picked)
+        picked.sub_(value.view(-1, 1)).sub_(norm.log_())
+        loss = -float(torch.sum(picked)) / batch_size
+        if log_base:
+            loss /= math.log(log_base)
+        return loss
 
     def linear(self, opt, target):
         pass
 
     @staticmethod
-    def backward_softmax(softmax, target):
+    def backward_softmax(softmax, target, out=None):
         # computes and returns the gradient of the Loss with
         # respect to the input to this layer.
-        d_probs = softmax
+        batch_size = softmax.size(0)
+        d_probs = torch.div(softmax, batch_size, out=out)
         # Gradient of loss
-        d_probs[range(dset.CIFAR10.batch_size), target] -= 1  
-        d_probs /= dset.CIFAR10.batch_size
-        return d_probs
+        return d_probs.scatter_(1, target.view(-1, 1).to(d_probs.device), -1. / batch_size, 
+                                reduce='add')
+
+    def plan_fprop(self, model, arena, lth, param=None):
+        """ Fprop step of the last layer (loss included, in fp32) """
+        src, output = arena.output[lth - 1], arena.output
+        fp32 = torch.float32
+        probs = output[lth] = arena.new(src.size(1), fp32)
+        norm, picked = arena.new(1, fp32), arena.new(1, fp32)
+        value = arena.new(1, fp32).view(-1)
+        index = value.long()
+        buffers = probs, norm, value, index, picked
+        fprop, infer = self.plan_classify(model, src, output, lth, *buffers)
+        if arena.dtype is None:
+            return fprop, infer
+
+        # Upcast the logits first
+        logits = arena.new(src.size(1), fp32)
+        fprop, infer = self.plan_classify(model, logits, output, lth, *buffers)
+
+        def fprop_low_precision():
+            logits.copy_(src)
+            fprop()
+
+        def infer_low_precision():
+            logits.copy_(src)
+            infer()
+
+        return fprop_low_precision, infer_low_precision
+
+    def plan_classify(self, model, src, output, lth, probs, norm, value, index, picked):
+        """ Classifier (+ loss) steps reading the logits in <src> """
+        log_base = self.log_base
+
+        if self.classifier == 'LogSoftmax':  # Fused with the loss
+            fused = self.log_softmax
+
+            def fprop():
+                output[lth] = probs
+                model.set_loss(fused(src, model.target, probs, norm, (value, index), log_base, 
+                                     picked))
+
+            def infer():
+                loss = fused(src, model.target, probs, norm, (value, index), log_base, picked)
+                # Confidence: max. softmax = 1 / sum(exp(opt - max))
+                torch.neg(norm.view(-1), out=value).exp_()
+                output[lth], model.predictions = value, index.cpu()
+                model.set_loss(loss)
+
+            return fprop, infer
+
+        classify = {
+            'Softmax': self.softmax,
+        }[self.classifier]
+
+        def fprop():
+            output[lth] = classify(src, out=probs, norm=norm)
+            model.CELoss(probs, model.target, log_base)
+
+        def infer():
+            classify(src, out=probs, norm=norm)
+            torch.max(probs, 1, out=(value, index))
+            output[lth], model.predictions = value, index.cpu()
+            model.CELoss(value, model.target, log_base)
+
+        return fprop, infer
+
+    def plan_bprop(self, model, arena, lth, param=None):
+        """ Bprop step of the last layer """
+        probs = arena.output[lth]
+        out = arena.grad_output[lth] = arena.new(probs.size(1))
+        backward = {
+            'Softmax': self.backward_softmax,
+            'LogSoftmax': self.backward_softmax,
+        }[self.classifier]
+
+        def bprop():
+            backward(probs, model.target, out=out)
+
+        if arena.dtype is None:
+            return bprop
+
+        # Gradient in fp32, (loss scaled) into compute precision
+        grad = arena.new(probs.size(1), torch.float32)
+
+        def bprop_low_precision():
+            backward(probs, model.target, out=grad)
+            torch.mul(grad, model.loss_scale, out=out)
+
+        return bprop_low_precision
 
 
 class Optimize:
-    """Schedules learning rate and saves the optimum paramters"""
+    """Schedules learning rate, updates and saves the optimum paramters"""
 
     def __init__(self, m_object):
         self.m_alias = m_object
         self.lr0 = m_object.lr
+        # Shadow copy of the best parameters so far, allocated once 
+        # (starts as the current, e.g. loaded, parameters)
+        self.best_weights = [w.clone() for w in m_object.weights]
+        self.best_biases = [b.clone() for b in m_object.biases]
+        self.best_stats = [s.clone() for s in m_object.stats()]
+        # Update rules other than plain SGD (ModelNN.update_parameters) 
+        # keep their state buffers here, allocated once.
+        if m_object.solver == 'sgd':
+            return
+        self.update = {
+            'momentum': self.momentum,
+            'nesterov': self.nesterov,
+            'adam': self.adam,
+        }[m_object.solver]
+        self.params = m_object.weights + m_object.biases
+        self.grads = m_object.grad_weights + m_object.grad_biases
+        self.velocity = [p.clone().zero_() for p in self.params]
+        if m_object.solver == 'adam':
+            self.sq_avg = [p.clone().zero_() for p in self.params]
+            self.denom = [p.clone().zero_() for p in self.params]
+        self.num_updates = 0
+        m_object.optimizer = self
 
     def time_decay(self, epoch, decay=0):
         self.m_alias.lr = self.lr0 / (1 + decay * epoch)
@@ -399,16 +1173,67 @@ class Optimize:
             self.m_alias.optimum['Loss'], self.m_alias.optimum['Epoch'], \
             self.m_alias.optimum['Learning rate'] = \
                 (self.m_alias.loss, epoch, self.m_alias.lr)
+            # Snapshot (copy) the live params
+            for best, p in zip(self.best_weights + self.best_biases + self.best_stats,
+                               self.m_alias.weights + self.m_alias.biases + self.m_alias.stats()):
+                best.copy_(p)
             self.m_alias.optimum['Weights'], self.m_alias.optimum['Biases'] = \
-                (self.m_alias.weights, self.m_alias.biases)
+                (self.best_weights, self.best_biases)
         # Save best params @ last epoch
         if epoch == self.m_alias.epochs - 1:
             # Set optimum parameters
-            self.m_alias.weights, self.m_alias.biases = \
-                (self.m_alias.optimum['Weights'], self.m_alias.optimum['Biases'])
+            self.restore()
             # Print least loss
             print("\nOptimum loss in %d epochs is: %f" %
                   (self.m_alias.epochs, self.m_alias.optimum['Loss']))
 
+    def restore(self):
+        """ Copy the best params back into the live ones """
+        for p, best in zip(self.m_alias.weights + self.m_alias.biases + self.m_alias.stats(),
+                           self.best_weights + self.best_biases + self.best_stats):
+            p.copy_(best)
+        self.m_alias.sync_compute_params()
+        # Live params (shared with the layers) are the optimum now
+        self.m_alias.optimum['Weights'], self.m_alias.optimum['Biases'] = \
+            (self.m_alias.weights, self.m_alias.biases)
+
+    def regularize(self):
+        """ L2 regularization gradient, in place """
+        for grad_ws, w, regularized in zip(self.m_alias.grad_weights, self.m_alias.weights,
+                                           self.m_alias.regularized):
+            if regularized:
+                grad_ws.add_(w, alpha=self.m_alias.reg)
+
+    def momentum(self):
+        """ SGD with (heavy ball) momentum """
+        self.regularize()
+        mu, lr = self.m_alias.momentum, self.m_alias.lr
+        for p, grad, v in zip(self.params, self.grads, self.velocity):
+            v.mul_(mu).add_(grad)
+            p.add_(v, alpha=-lr)
+
+    def nesterov(self):
+        """ SGD with Nesterov momentum """
+        self.regularize()
+        mu, lr = self.m_alias.momentum, self.m_alias.lr
+        for p, grad, v in zip(self.params, self.grads, self.velocity):
+            v.mul_(mu).add_(grad)
+            p.add_(grad.add_(v, alpha=mu), alpha=-lr)
+
+    def adam(self):
+        """ Adam, with bias corrected moments """
+        self.regularize()
+        self.num_updates += 1
+        (beta1, beta2), eps = self.m_alias.betas, self.m_alias.eps
+        bias_correction1 = 1 - beta1 ** self.num_updates
+        bias_correction2 = math.sqrt(1 - beta2 ** self.num_updates)
+        step_size = self.m_alias.lr / bias_correction1
+        for p, grad, avg, sq_avg, denom in zip(self.params, self.grads, self.velocity, 
+                                               self.sq_avg, self.denom):
+            avg.mul_(beta1).add_(grad, alpha=1 - beta1)
+            sq_avg.mul_(beta2).addcmul_(grad, grad, value=1 - beta2)
+            torch.sqrt(sq_avg, out=denom).div_(bias_correction2).add_(eps)
+            p.addcdiv_(avg, denom, value=-step_size)
+
     def clear_gradients(self):
         pass
@@ -0,0 +1,120 @@
+"""
+Standalone predictor for saved FC-NN models
+
+@author: apatgao
+"""
+
+# System imports
+from __future__ import print_function
+
+import pickle
+
+import torch
+
+# Custom imports
+from libs.nn import PARAM_LAYERS, Int8Linear, fold_batch_norm, fold_input_norm, normalize, \
+    sparse_linear
+
+
+def dense(w, b):
+    """ fp32 x w + b, into <out> """
+    def linear(ipt, out):
+        return torch.addmm(b, ipt, w, out=out)
+    return linear
+
+
+def sparse(csr, b):
+    """ x w + b with CSR weights, into <out> """
+    def linear(ipt, out):
+        return sparse_linear(csr, ipt, b, out=out)
+    return linear
+
+
+class Predictor(object):
+    """ Fprop-only classifier over the parameters of a saved model
+    or of its int8/sparse copy (tools.model_store); no argparse, 
+    configs or global state involved. Buffers are allocated once per 
+    batch size and reused by every call. """
+
+    def __init__(self, filename, batch_size=1000):
+        with open(filename, 'rb') as f:
+            status = pickle.load(f)
+        layers = status['Layer objs']
+        quantized = status.get('Quantized', False)
+        # Optimum parameters, in layer order
+        i = 0
+        for layer in layers:
+            if layer.LayerName in PARAM_LAYERS:
+                w = status['Weights'][i].cpu()
+                layer.w = w if quantized else w.float()
+                layer.b = status['Biases'][i].float().cpu()
+                i += 1
+        # Inference chain: pure matmul + ReLU (exported copies are folded already)
+        if not status.get('Folded', False):
+            layers = fold_batch_norm(layers)
+        # Per image normalization, or the dataset's folded into the first layer
+        self.input_norm = status.get('Input norm', 'sample')
+        if self.input_norm == 'dataset':
+            layers = fold_input_norm(layers, status['Input mean'].float().cpu(), 
+                                     status['Input std'].float().cpu())
+        linears = [layer for layer in layers if layer.LayerName == 'Linear']
+        if quantized:
+            self.linears = [Int8Linear(layer.w, scale.float().cpu(), layer.b)
+                            for layer, scale in zip(linears, status['Weight scales'])]
+        else:
+            self.linears = [sparse(layer.w, layer.b) if layer.w.layout == torch.sparse_csr 
+                            else dense(layer.w, layer.b) for layer in linears]
+        self.widths = [layer.b.size(1) for layer in linears]
+        # Sparse layers write their output transposed (see sparse_linear)
+        self.transposed = [layer.w.layout == torch.sparse_csr for layer in linears]
+        first = linears[0].w
+        self.num_inputs = first.size(1) if first.layout == torch.sparse_csr else first.size(0)
+        self.batch_size = batch_size
+        self.buffers = {}
+
+    def get_buffers(self, batch_size):
+        """ Input, activation & output buffers for <batch_size> """
+        buffers = self.buffers.get(batch_size)
+        if buffers is None:
+            ipt = torch.zeros(batch_size, self.num_inputs)
+            outputs = [torch.zeros(width, batch_size).t() if transposed else 
+                       torch.zeros(batch_size, width) 
+                       for width, transposed in zip(self.widths, self.transposed)]
+            top = torch.zeros(batch_size, 1), torch.zeros(batch_size, 1).long()
+            norm = torch.zeros(batch_size, 1)
+            buffers = self.buffers[batch_size] = ipt, outputs, top, norm
+        return buffers
+
+    def forward(self, images):
+        """ Class probabilities of a [N x 3 x 32 x 32] uint8 batch """
+        images = torch.as_tensor(images)
+        if not images.size(0):
+            return torch.zeros(0, self.widths[-1])
+        probs = []
+        for b_start in range(0, images.size(0), self.batch_size):
+            chunk = images[b_start:b_start + self.batch_size]
+            batch_size = chunk.size(0)
+            ipt, outputs, (value, index), norm = self.get_buffers(batch_size)
+            ipt.copy_(chunk.reshape(batch_size, -1))
+            src = normalize(ipt, batch_size, out=ipt) if self.input_norm == 'sample' else ipt
+            for lth, (linear, out) in enumerate(zip(self.linears, outputs)):
+                src = linear(src, out)
+                if lth < len(self.linears) - 1:
+                    src.clamp_(min=0)
+            # Stable softmax
+            torch.max(src, 1, keepdim=True, out=(value, index))
+            src.sub_(value).exp_()
+            src.div_(torch.sum(src, dim=1, keepdim=True, out=norm))
+            # Copy out, the buffers are reused by the next call
+            probs.append(src.clone())
+        return torch.cat(probs) if len(probs) > 1 else probs[0]
+
+    def predict(self, images):
+        """ Predicted labels & class probabilities """
+        probs = self.forward(images)
+        return torch.argmax(probs, 1), probs
+
+    def predict_topk(self, images, k=5):
+        """ Top <k> labels & their probabilities, most likely first """
+        probs, labels = torch.topk(self.forward(images), k, 1)
+        return labels, probs
@@ -0,0 +1,201 @@
+"""
+Opt-in per layer profiling of ModelNN plans
+
+@author: apatgao
+"""
+
+# System imports
+from __future__ import print_function
+
+import json
+import time
+
+import torch
+
+# Custom imports
+from libs.check_args import using_gpu
+
+# Phases, in report order
+PHASES = ['data', 'normalize', 'forward', 'loss', 'backward', 'update']
+
+
+def layer_label(layer, lth):
+    """ e.g. '0: Linear( 3072 x 2048 )' """
+    if layer.LayerName in ('Linear', 'BatchNorm'):
+        return '%d: %s( %d x %d )' % (lth, layer.LayerName, layer.ipt_neurons, layer.opt_neurons)
+    if layer.LayerName == 'Activation':
+        return '%d: %s( %s )' % (lth, layer.LayerName, layer.activation)
+    return '%d: %s( %s )' % (lth, layer.LayerName, layer.classifier)
+
+
+def step_cost(layer, phase, batch_size, width, itemsize, first):
+    """ (FLOPs, bytes moved) estimate of one plan step of <layer>, 
+    <width> outputs wide (<first>: no gradient w.r.t. the input) """
+    b = batch_size
+    if layer.LayerName == 'Linear':
+        n_in, n_out = layer.ipt_neurons, layer.opt_neurons
+        params = (n_in + 1) * n_out
+        if phase == 'forward':
+            return 2 * b * n_in * n_out, itemsize * (b * n_in + params + b * n_out)
+        # grad w.r.t. weights & bias (+ input)
+        matmuls = 1 if first else 2
+        return (matmuls * 2 * b * n_in * n_out + b * n_out,
+                itemsize * (b * n_in + b * n_out + params + (0 if first else params + b * n_in)))
+    if layer.LayerName == 'BatchNorm':
+        n = layer.opt_neurons
+        return (8 if phase == 'forward' else 10) * b * n, itemsize * 4 * b * n
+    if layer.LayerName == 'Activation':
+        return b * width, itemsize * 2 * b * width
+    # Criterion (fp32)
+    return 5 * b * width, 4 * 4 * b * width
+
+
+class Record(object):
+    """ Totals of one (layer, phase) """
+
+    def __init__(self, name, phase, flops, nbytes, allocated):
+        self.name, self.phase = name, phase
+        self.flops, self.nbytes, self.allocated = flops, nbytes, allocated
+        self.calls, self.seconds = 0, 0.
+
+
+class Profiler(object):
+    """ Wall time, FLOPs & bytes (moved, and allocated in the arena)
+    per layer & phase: data, normalize, forward, loss, backward, update.
+    Totals are kept per epoch, and the first <max_events> steps as
+    Chrome trace events (chrome://tracing, Perfetto) """
+
+    def __init__(self, max_events=200000):
+        self.records = {}
+        self.epochs = []
+        self.last = {}
+        self.events = []
+        self.max_events = max_events
+        self.start = time.time()
+        self.sync = torch.cuda.synchronize if using_gpu() else None
+
+    def attach(self, model):
+        """ Profile <model>'s plans (recompiled), input
+        normalization & parameter updates """
+        model.profiler = self
+        model.reset_plans()
+        # Timed into a record per batch size, as the plan steps
+        normalize_input, timed = model.normalize_input, {}
+
+        def timed_normalize_input(ipt):
+            batch_size = ipt.size(0)
+            if batch_size not in timed:
+                timed[batch_size] = self.timed(normalize_input, 
+                                               self.input_record(model, batch_size))
+            return timed[batch_size](ipt)
+
+        model.normalize_input = timed_normalize_input
+        update_parameters = model.update_parameters
+        num_params = sum(p.numel() for p in model.weights + model.biases)
+        record = self.record('parameters', 'update', 4 * num_params, 4 * 4 * num_params)
+        model.update_parameters = self.timed(update_parameters, record)
+
+    def input_record(self, model, batch_size):
+        """ Record of the input normalization of <batch_size> images: mean, 
+        std & scale of each, or one multiply-add with the dataset statistics """
+        size = batch_size * model.layers[0].ipt_neurons
+        flops, nbytes = (2 * size, 4 * 2 * size) if model.input_norm == 'dataset' \
+            else (5 * size, 4 * 4 * size)
+        name = 'input'
+        if batch_size != model.batch_size:
+            name += ' @%d' % batch_size
+        return self.record(name, 'normalize', flops, nbytes)
+
+    def record(self, name, phase, flops=0, nbytes=0, allocated=0):
+        key = (name, phase)
+        if key not in self.records:
+            self.records[key] = Record(name, phase, flops, nbytes, allocated)
+        else:
+            self.records[key].allocated = max(self.records[key].allocated, allocated)
+        return self.records[key]
+
+    def timed(self, func, record):
+        """ <func>, timed into <record> """
+        events, max_events, sync = self.events, self.max_events, self.sync
+
+        def timed_func(*args, **kwargs):
+            start = time.time()
+            output = func(*args, **kwargs)
+            if sync is not None:
+                sync()
+            seconds = time.time() - start
+            record.calls += 1
+            record.seconds += seconds
+            if len(events) < max_events:
+                events.append((record, start, seconds))
+            return output
+
+        return timed_func
+
+    def wrap(self, model, arena, lth, phase, step, allocated):
+        """ Timed plan step of layer <lth> (see ModelNN.compile) """
+        layer = model.layers[lth]
+        if layer.LayerName == 'Criterion' and phase == 'forward':
+            phase = 'loss'
+        itemsize = 2 if arena.dtype is not None else 4
+        flops, nbytes = step_cost(layer, phase, arena.batch_size, arena.output[lth].size(1),
+                                  itemsize, lth == 0)
+        # Per batch size: one record per plan
+        name = layer_label(layer, lth)
+        if arena.batch_size != model.batch_size:
+            name += ' @%d' % arena.batch_size
+        return self.timed(step, self.record(name, phase, flops, nbytes, allocated))
+
+    def data(self, loader):
+        """ Batches of <loader>, the time to get each one profiled """
+        record = self.record('loader', 'data')
+        batches = iter(loader)
+        next_batch = self.timed(lambda: next(batches, None), record)
+        while True:
+            batch = next_batch()
+            if batch is None:
+                return
+            yield batch
+
+    def end_epoch(self, epoch):
+        """ Close the totals of <epoch> """
+        totals = {}
+        for key, r in self.records.items():
+            calls, seconds = self.last.get(key, (0, 0.))
+            totals[key] = (r.calls - calls, r.seconds - seconds)
+            self.last[key] = (r.calls, r.seconds)
+        self.epochs.append((epoch, totals))
+
+    def summary(self):
+        """ Print the totals per layer & phase, slowest first """
+        total = sum(r.seconds for r in self.records.values()) or 1.
+        print('\n%-30s %-10s %8s %11s %7s %10s %9s %11s' % (
+            'Layer', 'Phase', 'Calls', 'Time (ms)', '%', 'GFLOP/s', 'GB/s', 'Alloc (MB)'))
+        for r in sorted(self.records.values(), key=lambda r: -r.seconds):
+            seconds = r.seconds or 1e-12
+            print('%-30s %-10s %8d %11.1f %7.1f %10.2f %9.2f %11.2f' % (
+                r.name, r.phase, r.calls, 1e3 * r.seconds, 100. * r.seconds / total,
+                r.calls * r.flops / seconds / 1e9, r.calls * r.nbytes / seconds / 1e9,
+                r.allocated / 2. ** 20))
+        by_phase = dict((phase, 0.) for phase in PHASES)
+        for r in self.records.values():
+            by_phase[r.phase] += r.seconds
+        print('\n' + '  '.join('%s: %.1f%%' % (phase, 100. * by_phase[phase] / total)
+                               for phase in PHASES))
+        if len(self.epochs) > 1:
+            print('\nPer epoch (s): ' + ', '.join(
+                '%d: %.2f' % (epoch + 1, sum(s for _, s in totals.values()))
+                for epoch, totals in self.epochs))
+
+    def save_trace(self, filename):
+        """ Chrome trace event JSON of the recorded steps """
+        trace = [{
+            'name': r.name, 'cat': r.phase, 'ph': 'X', 'pid': 0, 'tid': PHASES.index(r.phase),
+            'ts': 1e6 * (start - self.start), 'dur': 1e6 * seconds,
+            'args': {'flops': r.flops, 'bytes': r.nbytes}
+        } for r, start, seconds in self.events]
+        trace += [{'name': 'thread_name', 'ph': 'M', 'pid': 0, 'tid': tid,
+                   'args': {'name': phase}} for tid, phase in enumerate(PHASES)]
+        with open(filename, 'w') as f:
+            json.dump({'traceEvents': trace, 'displayTimeUnit': 'ms'}, f)
+        print('Profile trace saved as %s (%d events)' % (filename, len(self.events)))
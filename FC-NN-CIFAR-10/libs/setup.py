@@ -7,6 +7,11 @@ from termcolor import colored
 # Custom imports
 from libs.check_args import arguments, using_gpu
 
+# CPU until setup_hardware() says otherwise
+dtype = torch.FloatTensor
+# Training batch size picked by --AUTOTUNE (None: the config's)
+batch_size = None
+
 
 def setup_hardware():
     global dtype
@@ -29,7 +34,37 @@ def setup_hardware():
     else:  # Want CPU
         print('\nUSING CPU.')
         dtype = torch.FloatTensor
+    if args.AUTOTUNE and not use_gpu:
+        autotune_cpu(args)
+
+
+def autotune_cpu(args):
+    """ Thread counts & training batch size tuned for this host 
+    (see tools.autotune) """
+    global batch_size
+
+    if not (args.FIT or args.TRAIN):
+        print('Nothing to autotune without --FIT/--TRAIN.')
+        return
+    from tools.autotune import autotune
+    threads, interop_threads, batch_size = autotune(args.CFG)
+    if args.WORKERS > 1:
+        # Data-parallel workers split the cores themselves
+        print('Autotuned batch size: %d' % batch_size)
+        return
+    torch.set_num_threads(threads)
+    try:
+        torch.set_num_interop_threads(interop_threads)
+    except RuntimeError:
+        # Only settable before any inter-op parallel work
+        pass
+    print('Autotuned threads: %d (inter-op: %d), batch size: %d' % (
+        threads, torch.get_num_interop_threads(), batch_size))
 
 
 def default_tensor_type():
-    return dtype
\ No newline at end of file
+    return dtype
+
+
+def tuned_batch_size():
+    return batch_size
\ No newline at end of file
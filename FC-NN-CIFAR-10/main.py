@@ -7,12 +7,64 @@ import torch
 from libs.check_args import using_gpu, parse_arg, arguments
 from libs.setup import setup_hardware
 
-from tools.model_store import load_model
-from tools.fit_net import fit
-from tools.train_net import train
-from tools.test_net import test
-from tools.infer import inferences
-from tools.best_model import best_model_selection
+
+# Tools are imported by the mode that runs them, so that a run 
+# only pays for the modules (and their dependencies) it uses
+def load_model(*args):
+    from tools.model_store import load_model
+    return load_model(*args)
+
+
+def fit(*args):
+    from tools.fit_net import fit
+    return fit(*args)
+
+
+def train(*args):
+    from tools.train_net import train
+    return train(*args)
+
+
+def test(*args):
+    from tools.test_net import test
+    return test(*args)
+
+
+def inferences(*args):
+    from tools.infer import inferences
+    return inferences(*args)
+
+
+def best_model_selection(**kwargs):
+    from tools.best_model import best_model_selection
+    return best_model_selection(**kwargs)
+
+
+def parity(*args):
+    from tools.parity import parity
+    return parity(*args)
+
+
+def export_model(*args):
+    from tools.export import export_model
+    return export_model(*args)
+
+
+def save_quantized(*args):
+    from tools.model_store import save_quantized
+    return save_quantized(*args)
+
+
+def save_sparse(*args):
+    from tools.model_store import save_sparse
+    return save_sparse(*args)
+
+
+def prune(model):
+    from configs.config_model import configs
+    sparsity = configs()["PRUNE"]["SPARSITY"]
+    print('Pruning %.1f%% of the Linear weights' % (100 * sparsity))
+    model.prune(sparsity)
 
 
 def main():
@@ -42,6 +94,9 @@ def main():
             args.FIT = False
         elif args.TRAIN:
             model = load_model(args.LOAD)
+            if args.PRUNE:
+                # Fine-tune the pruned net
+                prune(model)
             print('Training net for loaded model')
             model = train(model)
             if args.TEST:
@@ -59,6 +114,22 @@ def main():
             model = load_model(args.LOAD)
             print('Testing net for loaded model')
             inferences(model)
+        elif args.PARITY:
+            model = load_model(args.LOAD)
+            print('Parity report for loaded model')
+            parity(model, args.PARITY)
+        elif args.PRUNE:
+            model = load_model(args.LOAD)
+            prune(model)
+            save_sparse(args.SAVE or 'sparse_' + args.LOAD, model)
+        elif args.QUANTIZE:
+            model = load_model(args.LOAD)
+            print('Quantizing loaded model')
+            save_quantized(args.QUANTIZE, model)
+        elif args.EXPORT:
+            model = load_model(args.LOAD)
+            export_model(args.EXPORT, model)
+            parity(model, 'export', args.EXPORT)
                 
     elif args.NEW:
         print('\nWorking with new model.')
@@ -83,6 +154,10 @@ def main():
                 inferences(model)
             args.TRAIN = False
 
+    if args.PROFILE and globals().get('model') is not None:
+        model.profiler.summary()
+        model.profiler.save_trace(args.PROFILE)
+
     # Final goodbye
     print('\n' + '-' * 7 + '\nExiting\n' + '-' * 7)
     # Clear cache if using GPU (Unsure of effectiveness)
@@ -0,0 +1,62 @@
+""" Shared setup: CPU, the default config, small synthetic nets & data """
+
+# System imports
+import argparse
+import os
+import sys
+
+import pytest
+import torch
+import yaml
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Custom imports
+from libs import check_args  # noqa: E402
+from configs import config_model  # noqa: E402
+from libs import nn as nnc  # noqa: E402
+
+# As parsed with no mode flags, on the CPU
+check_args.args = argparse.Namespace(
+    bms=False, CFG=os.path.join(ROOT, 'configs', 'fully_connected.yaml'), GPU_ID=None,
+    SAVE=None, LOAD=None, NEW=False, FIT=False, TRAIN=False, WORKERS=1, HOGWILD=False,
+    AUTOTUNE=False, TEST=False, INFER=False, PARITY=None, EXPORT=None, PROFILE=None,
+    PRUNE=False, QUANTIZE=None)
+with open(check_args.args.CFG) as f:
+    config_model.cfg = yaml.safe_load(f)
+
+
+def build(widths=(3072, 64, 32, 10), batch_norm=False, lr=0.05):
+    """ Linear (+ BatchNorm) + ReLU layers of <widths>, fused LogSoftmax
+    criterion (natural log loss) """
+    torch.manual_seed(0)
+    model = nnc.ModelNN()
+    model.weights_decay, model.lr = 0.01, lr
+    for num_ipt, num_opt in zip(widths[:-2], widths[1:-1]):
+        model.add(nnc.LinearLayer(num_ipt, num_opt))
+        if batch_norm:
+            model.add(nnc.BatchNorm(num_opt))
+        model.add(nnc.Activation('ReLU'))
+    model.add(nnc.LinearLayer(*widths[-2:]))
+    model.add(nnc.CeCriterion('LogSoftmax', None))
+    # Centered weights & non zero biases, so that every path is exercised
+    for layer in model.layers:
+        if layer.LayerName == 'Linear':
+            layer.w.sub_(layer.w.mean())
+            layer.b.uniform_(-0.1, 0.1)
+    return model
+
+
+def data(n=100, seed=1):
+    """ <n> float pixel images & labels, a class dependent pattern added """
+    g = torch.Generator().manual_seed(seed)
+    images = torch.randint(0, 256, (n, 3, 32, 32), generator=g).float()
+    labels = torch.randint(0, 10, (n,), generator=g)
+    images[:, 0, 0, :10] += 100 * torch.nn.functional.one_hot(labels, 10).float()
+    return images, labels
+
+
+@pytest.fixture
+def batch():
+    return data()
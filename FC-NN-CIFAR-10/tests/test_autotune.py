@@ -0,0 +1,53 @@
+""" tools.autotune: tuned settings cached per host & config """
+
+# System imports
+import json
+import os
+
+import yaml
+
+# Custom imports
+from configs import config_model
+from tools import autotune
+
+from conftest import ROOT
+
+
+def test_sweeps_once_per_host_and_config(tmp_path, monkeypatch):
+    # set_hyper_parameters replaces the config
+    monkeypatch.setattr(config_model, 'cfg', config_model.cfg)
+    sweeps = []
+
+    def sweep(model, tune):
+        sweeps.append(tune)
+        return [(1, 50, 1000.), (2, 100, 900.)]
+
+    monkeypatch.setattr(autotune, 'sweep', sweep)
+    with open(os.path.join(ROOT, 'configs', 'fully_connected.yaml')) as f:
+        cfg = yaml.safe_load(f)
+    cfg['AUTOTUNE']['CACHE'] = str(tmp_path / 'outputs' / 'autotune.json')
+    config_file = str(tmp_path / 'config.yaml')
+
+    def tune(solver):
+        cfg['SOLVER']['TYPE'] = solver
+        with open(config_file, 'w') as f:
+            yaml.safe_dump(cfg, f)
+        return autotune.autotune(config_file)
+
+    threads, interop_threads, batch_size = tune('sgd')
+    assert (threads, batch_size) == (1, 50) and interop_threads >= 1
+    assert tune('sgd') == (threads, interop_threads, batch_size)
+    assert len(sweeps) == 1
+    # A setting that changes the step cost tunes again
+    tune('adam')
+    assert len(sweeps) == 2
+    with open(cfg['AUTOTUNE']['CACHE']) as f:
+        cache = json.load(f)
+    assert len(cache) == 2
+    # So does another torch version
+    for tuned in cache.values():
+        tuned['torch'] = '0.0'
+    with open(cfg['AUTOTUNE']['CACHE'], 'w') as f:
+        json.dump(cache, f)
+    tune('sgd')
+    assert len(sweeps) == 3
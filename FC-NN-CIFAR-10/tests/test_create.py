@@ -0,0 +1,37 @@
+""" tools.create: dataset input normalization of new & loaded models """
+
+# System imports
+import os
+
+import yaml
+
+# Custom imports
+from configs import config_model
+from libs import check_args
+from tools import create
+
+from conftest import ROOT
+
+
+def test_norm_stats_only_for_new_models(tmp_path, monkeypatch):
+    # set_hyper_parameters replaces the config
+    monkeypatch.setattr(config_model, 'cfg', config_model.cfg)
+    with open(os.path.join(ROOT, 'configs', 'fully_connected.yaml')) as f:
+        cfg = yaml.safe_load(f)
+    cfg['MODEL']['INPUT_NORM'] = 'dataset'
+    config_file = str(tmp_path / 'config.yaml')
+    with open(config_file, 'w') as f:
+        yaml.safe_dump(cfg, f)
+    monkeypatch.setattr(check_args.args, 'CFG', config_file)
+    computed = []
+
+    def norm_stats(directory):
+        computed.append(directory)
+        return [125., 123., 114.], [63., 62., 66.]
+
+    monkeypatch.setattr(create.dset, 'norm_stats', norm_stats)
+    # Loaded models get the saved statistics
+    assert create.create_model(new=False).input_norm == 'sample'
+    assert not computed
+    model = create.create_model()
+    assert len(computed) == 1 and model.input_norm == 'dataset'
@@ -0,0 +1,134 @@
+""" Dataset tensors, binary cache, batch sampling & normalization statistics """
+
+# System imports
+import os
+
+import pytest
+import torch
+
+# Custom imports
+from data import dataset as dset
+from vision.transforms import Transforms
+
+
+def random_split(n=20, seed=0):
+    g = torch.Generator().manual_seed(seed)
+    images = torch.randint(0, 256, (n, 3, 32, 32), generator=g).byte()
+    labels = torch.randint(0, 10, (n,), generator=g)
+    return images, labels
+
+
+def test_transforms_keep_one_uint8_tensor():
+    images, labels = random_split()
+    augmented = Transforms(dset.ImageDataset(images, labels), lr_flip=True,
+                           rotate90=True, times=1)
+    assert augmented.images.dtype == torch.uint8 and augmented.images.is_contiguous()
+    assert len(augmented) == 3 * len(images)
+    # Augmented, then the original
+    assert torch.equal(augmented.images[:20], torch.flip(images, [3]))
+    assert torch.equal(augmented.images[40:], images)
+    assert torch.equal(augmented.labels, labels.repeat(3))
+    # Floats one batch at a time
+    batch_images, batch_labels = next(dset.data_loader(augmented, 25))
+    assert batch_images.dtype == torch.float32
+    assert torch.equal(batch_images, augmented.images[:25].float())
+    assert torch.equal(batch_labels, augmented.labels[:25])
+
+
+def test_cache_round_trip(tmp_path):
+    images, labels = random_split()
+    filename = str(tmp_path / 'train.bin')
+    dset.save_cache(filename, images, labels)
+    loaded_images, loaded_labels = dset.load_cache(filename, verify=True)
+    assert torch.equal(loaded_images, images)
+    assert torch.equal(loaded_labels, labels)
+
+
+def test_cache_rejects_corrupt_or_truncated_files(tmp_path):
+    images, labels = random_split()
+    filename = str(tmp_path / 'train.bin')
+    dset.save_cache(filename, images, labels)
+    with open(filename, 'r+b') as f:
+        f.seek(dset.CACHE_HEADER_SIZE + 100)
+        byte = f.read(1)
+        f.seek(-1, os.SEEK_CUR)
+        f.write(bytes([(byte[0] + 1) % 256]))
+    assert dset.load_cache(filename, verify=True) is None
+    with open(filename, 'r+b') as f:
+        f.truncate(os.path.getsize(filename) - 8)
+    assert dset.load_cache(filename) is None
+    assert dset.load_cache(str(tmp_path / 'missing.bin')) is None
+
+
+def test_batch_sampler_covers_every_example_once():
+    sampler = dset.BatchSampler(105, 25, shuffled=True)
+    batches = list(sampler)
+    assert len(batches) == len(sampler) == 5
+    assert torch.equal(torch.sort(torch.cat(batches))[0], torch.arange(105))
+    # Tail batch kept unless dropped
+    assert batches[-1].numel() == 5
+    assert len(dset.BatchSampler(105, 25, drop_last=True)) == 4
+    # In order unless shuffled
+    assert torch.equal(torch.cat(list(dset.BatchSampler(105, 25))), torch.arange(105))
+
+
+def test_prefetcher_matches_data_loader():
+    dataset = dset.ImageDataset(*random_split(105))
+    prefetcher = dset.Prefetcher(dataset, 25, depth=2)
+    # An epoch per pass
+    for _ in range(2):
+        batches = list(prefetcher)
+        expected = list(dset.data_loader(dataset, 25))
+        assert len(batches) == len(expected) == 5
+        for (images, labels), (ref_images, ref_labels) in zip(batches, expected):
+            assert torch.equal(images, ref_images) and torch.equal(labels, ref_labels)
+    assert prefetcher.batches == 5 and 'Prefetch queue' in prefetcher.summary()
+
+
+def test_prefetcher_raises_the_producer_error():
+    images, labels = random_split(50)
+    # Labels of the second batch are missing
+    prefetcher = dset.Prefetcher(dset.ImageDataset(images, labels[:30]), 25)
+    batches = iter(prefetcher)
+    next(batches)
+    with pytest.raises(IndexError):
+        next(batches)
+
+
+def test_prefetcher_recycles_pinned_buffers(monkeypatch):
+    class Event(object):
+        """ Stand-in for torch.cuda.Event (no GPU) """
+        def record(self):
+            pass
+
+        def synchronize(self):
+            pass
+
+    monkeypatch.setattr(torch.Tensor, 'pin_memory', lambda self: self)
+    monkeypatch.setattr(torch.cuda, 'Event', Event)
+    dataset = dset.ImageDataset(*random_split(105))
+    prefetcher = dset.Prefetcher(dataset, 25, depth=2, pin_memory=True)
+    buffers = {25: set(), 5: set()}
+    for _ in range(2):
+        for (images, labels), indices in zip(prefetcher, dset.BatchSampler(105, 25)):
+            # uint8, gathered in order
+            assert torch.equal(images, dataset.images[indices])
+            assert torch.equal(labels, dataset.labels[indices])
+            buffers[images.size(0)].add(images.data_ptr())
+    # Allocated once: depth + 1 per batch size, across epochs
+    assert len(buffers[25]) == 3
+    assert len(prefetcher.free[25].queue) == len(prefetcher.free[5].queue) == 3
+
+
+def test_norm_stats_follow_the_cache(tmp_path):
+    os.makedirs(str(tmp_path / 'cifar10'))
+    cache = str(tmp_path / 'cifar10' / 'train.bin')
+    images, labels = random_split()
+    dset.save_cache(cache, images, labels)
+    mean, std = dset.norm_stats(str(tmp_path))
+    pixels = images.double().transpose(0, 1).reshape(3, -1)
+    assert torch.allclose(torch.tensor(mean).double(), pixels.mean(1))
+    assert torch.allclose(torch.tensor(std).double(), pixels.std(1, unbiased=False))
+    # A rebuilt cache is not served the old statistics
+    dset.save_cache(cache, images // 2, labels)
+    assert dset.norm_stats(str(tmp_path))[0] != mean
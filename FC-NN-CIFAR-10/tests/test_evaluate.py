@@ -0,0 +1,26 @@
+""" tools.evaluate: streamed evaluation against one whole batch """
+
+# System imports
+import pytest
+import torch
+
+# Custom imports
+from data import dataset as dset
+from tools.evaluate import evaluate
+
+from conftest import build
+
+
+def test_streamed_chunks_match_one_batch(batch):
+    images, labels = batch
+    model = build()
+    model.train(images, labels)
+    model.test(images, labels)
+    loss, predictions = model.loss, model.predictions.clone()
+    confidences = model.output[-1].clone()
+    # Chunks of 30: the last one is a tail of 10
+    acc = evaluate(model, dset.stream_loader(dset.ImageDataset(images, labels), 30))
+    assert model.loss == pytest.approx(loss, rel=1e-5)
+    assert torch.equal(model.predictions, predictions)
+    assert torch.allclose(model.confidences, confidences)
+    assert acc == pytest.approx(100. * float(torch.mean((predictions == labels).float())))
@@ -0,0 +1,31 @@
+""" tools.export: TorchScript & ONNX copies against the model """
+
+# System imports
+import pytest
+import torch
+
+# Custom imports
+from tools.export import export_model, load_runtimes
+
+from conftest import build
+
+
+@pytest.mark.parametrize('input_norm', ['sample', 'dataset'])
+def test_exported_runtimes_match_model(tmp_path, batch, input_norm):
+    pytest.importorskip('onnx')
+    images, labels = batch
+    model = build(batch_norm=True)
+    if input_norm == 'dataset':
+        model.set_input_norm('dataset', [125., 123., 114.], [63., 62., 66.])
+    for _ in range(3):
+        model.train(images, labels)
+    model.test(images, labels)
+    confidences, predictions = model.output[-1].clone(), model.predictions.clone()
+    files = export_model('net', model, directory=str(tmp_path / 'exported'))
+    # TorchScript, & ONNX Runtime if installed
+    for name, run in load_runtimes(*files):
+        # Batch size left dynamic
+        for chunk in (images, images[:7]):
+            probs = run(chunk)
+            assert torch.equal(torch.argmax(probs, 1), predictions[:chunk.size(0)]), name
+            assert torch.allclose(probs.max(1)[0], confidences[:chunk.size(0)], atol=1e-5), name
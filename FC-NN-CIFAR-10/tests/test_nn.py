@@ -0,0 +1,236 @@
+""" Compiled plans of libs.nn against torch autograd & each other """
+
+# System imports
+import copy
+import math
+
+import pytest
+import torch
+import torch.nn.functional as F
+
+# Custom imports
+from libs import nn as nnc
+
+from conftest import build
+
+
+def reference(model, images, labels):
+    """ Training mode loss & parameter gradients of <model> by autograd """
+    params = [p.clone().requires_grad_() for p in model.weights + model.biases]
+    weights, biases = params[:len(model.weights)], params[len(model.weights):]
+    x = images.view(images.size(0), -1)
+    x = (x - x.mean(1, keepdim=True)) / x.std(1, keepdim=True)
+    param = 0
+    for layer in model.layers:
+        if layer.LayerName == 'Linear':
+            x = torch.addmm(biases[param], x, weights[param])
+            param += 1
+        elif layer.LayerName == 'BatchNorm':
+            x = F.batch_norm(x, None, None, weights[param].view(-1), biases[param].view(-1),
+                             training=True, eps=layer.eps)
+            param += 1
+        elif layer.LayerName == 'Activation':
+            x = torch.relu(x)
+    loss = F.cross_entropy(x, labels)
+    return float(loss.detach()), torch.autograd.grad(loss, params)
+
+
+def last_logits(model):
+    """ Logits of the last Linear layer, as left in the arena """
+    lth = max(l for l, layer in enumerate(model.layers) if layer.LayerName == 'Linear')
+    return model.arena.output[lth]
+
+
+def run_folded(layers, ipt):
+    """ Logits of folded (Linear & ReLU only) <layers> """
+    for layer in layers:
+        if layer.LayerName == 'Linear':
+            ipt = torch.addmm(layer.b, ipt, layer.w)
+        elif layer.LayerName == 'Activation':
+            ipt = torch.relu(ipt)
+    return ipt
+
+
+@pytest.mark.parametrize('batch_norm', [False, True])
+def test_plan_gradients_match_autograd(batch, batch_norm):
+    images, labels = batch
+    model = build(batch_norm=batch_norm)
+    model.compute_gradients(images, labels)
+    loss, grads = reference(model, images, labels)
+    # The training loss includes the L2 term (not its gradient, added by the update)
+    loss += sum(0.5 * model.reg * float(torch.sum(w * w))
+                for w, regularized in zip(model.weights, model.regularized) if regularized)
+    assert model.loss == pytest.approx(loss, rel=1e-5)
+    for ours, ref in zip(model.grad_weights + model.grad_biases, grads):
+        assert torch.allclose(ours, ref, rtol=1e-4, atol=1e-6)
+
+
+def test_accumulation_matches_one_large_batch(batch):
+    images, labels = batch
+    large = build()
+    small = copy.deepcopy(large)
+    small.accum_steps = 4
+    large.train(images, labels)
+    for b_start in range(0, 100, 25):
+        small.train(images[b_start:b_start + 25], labels[b_start:b_start + 25])
+    assert small.accumulated == 0
+    for ours, ref in zip(small.weights + small.biases, large.weights + large.biases):
+        assert torch.allclose(ours, ref, rtol=1e-4, atol=1e-6)
+
+
+def test_batch_norm_folds_into_linear(batch):
+    images, labels = batch
+    model = build(batch_norm=True)
+    for _ in range(3):
+        model.train(images, labels)
+    model.test(images, labels)
+    folded = nnc.fold_batch_norm(model.layers)
+    assert not [layer for layer in folded if layer.LayerName == 'BatchNorm']
+    ipt = nnc.normalize(images.clone(), images.size(0))
+    assert torch.allclose(run_folded(folded, ipt), last_logits(model), rtol=1e-4, atol=1e-4)
+
+
+def test_dataset_input_norm_folds_into_first_linear(batch):
+    images, labels = batch
+    model = build(batch_norm=True)
+    model.set_input_norm('dataset', [125., 123., 114.], [63., 62., 66.])
+    for _ in range(3):
+        model.train(images, labels)
+    model.test(images, labels)
+    # Raw pixels in, normalization folded away
+    logits = run_folded(nnc.fold_layers(model), images.view(images.size(0), -1))
+    assert torch.allclose(logits, last_logits(model), rtol=1e-4, atol=1e-4)
+
+
+def test_regularization_skips_batch_norm_scale(batch):
+    images, labels = batch
+    model = build(batch_norm=True)
+    model.reg, model.lr = 0.5, 1.
+    model.compute_gradients(images, labels)
+    for grad in model.grad_weights + model.grad_biases:
+        grad.zero_()
+    model.update_parameters()
+    for w, regularized in zip(model.weights, model.regularized):
+        if not regularized:
+            assert torch.equal(w, torch.ones_like(w))
+
+
+def test_sparse_inference_matches_dense(batch):
+    images, labels = batch
+    model = build()
+    model.train(images, labels)
+    model.prune(0.9)
+    assert model.sparsity(0) == pytest.approx(0.9, abs=1e-3)
+    model.test(images, labels)
+    dense = last_logits(model).clone()
+    model.sparse_at = 0.5
+    model.reset_plans()
+    model.test(images, labels)
+    assert torch.allclose(last_logits(model), dense, rtol=1e-4, atol=1e-5)
+    # Pruned weights stay pruned while fine-tuning
+    masks = [w == 0 for w in model.weights]
+    model.train(images, labels)
+    for w, mask in zip(model.weights, masks):
+        assert not bool(torch.any(w[mask]))
+
+
+def test_arena_is_allocated_once_per_batch_size(batch):
+    images, labels = batch
+    model = build()
+    model.train(images, labels)
+    arena = model.arena
+
+    def buffers():
+        # (no gradient w.r.t. the input)
+        return [buf.data_ptr() for buf in arena.output + arena.grad_output[1:]]
+
+    allocated = buffers()
+    model.train(images, labels)
+    assert model.arena is arena and buffers() == allocated
+    # A tail batch gets its own arena, the full size one is kept
+    model.train(images[:30], labels[:30])
+    assert model.arena.batch_size == 30
+    model.train(images, labels)
+    assert model.arena is arena
+
+
+def test_backward_relu_in_place():
+    output = torch.relu(torch.randn(8, 5))
+    grad = torch.randn(8, 5)
+    expected = grad * (output > 0)
+    assert nnc.Activation.backward_relu(output, grad) is grad
+    assert torch.equal(grad, expected)
+
+
+@pytest.mark.parametrize('log_base', [None, 10])
+def test_fused_criterion_matches_torch(log_base):
+    g = torch.Generator().manual_seed(0)
+    logits = torch.randn(50, 10, generator=g) * 5
+    logits[0, 3] = 1000.  # exp() overflows unless shifted
+    target = torch.randint(0, 10, (50,), generator=g)
+    probs = torch.empty(50, 10)
+    loss = nnc.CeCriterion.log_softmax(logits, target, out=probs, log_base=log_base)
+    ref = F.cross_entropy(logits, target) / (math.log(log_base) if log_base else 1.)
+    assert loss == pytest.approx(float(ref), rel=1e-5)
+    assert torch.allclose(probs, torch.softmax(logits, 1), atol=1e-6)
+    # Gradient w.r.t. the logits (natural log loss)
+    logits.requires_grad_()
+    grad = torch.autograd.grad(F.cross_entropy(logits, target), logits)[0]
+    assert torch.allclose(nnc.CeCriterion.backward_softmax(probs, target), grad, atol=1e-7)
+
+
+@pytest.mark.parametrize('classifier', ['LogSoftmax', 'Softmax'])
+def test_tail_batch_matches_autograd(batch, classifier):
+    images, labels = batch
+    model = build()
+    model.layers[-1].classifier = classifier
+    model.compute_gradients(images, labels)
+    # Smaller last batch of an epoch
+    images, labels = images[:37], labels[:37]
+    model.accumulated = 0
+    model.compute_gradients(images, labels)
+    loss, grads = reference(model, images, labels)
+    loss += sum(0.5 * model.reg * float(torch.sum(w * w)) for w in model.weights)
+    assert model.loss == pytest.approx(loss, rel=1e-5)
+    for ours, ref in zip(model.grad_weights + model.grad_biases, grads):
+        assert torch.allclose(ours, ref, rtol=1e-4, atol=1e-6)
+
+
+@pytest.mark.parametrize('precision', ['bfloat16', 'float16'])
+def test_low_precision_tracks_float32(batch, precision):
+    images, labels = batch
+    reference, model = build(), build()
+    model.set_precision(precision, 128.)
+    for _ in range(3):
+        reference.train(images, labels)
+        model.train(images, labels)
+        assert model.loss == pytest.approx(reference.loss, rel=5e-2)
+    # fp32 master weights, updated in fp32
+    for w, ref in zip(model.weights, reference.weights):
+        assert w.dtype == torch.float32
+        assert torch.allclose(w, ref, atol=1e-2)
+
+
+def test_float16_overflow_skips_the_update(batch):
+    images, labels = batch
+    model = build()
+    model.set_precision('float16', 2. ** 100)
+    weights = [w.clone() for w in model.weights]
+    model.train(images, labels)
+    assert model.loss_scale == 2. ** 99
+    for w, saved in zip(model.weights, weights):
+        assert torch.equal(w, saved)
+
+
+def test_int8_inference_tracks_float32(batch):
+    images, labels = batch
+    model = build()
+    model.train(images, labels)
+    model.test(images, labels)
+    predictions = model.predictions.clone()
+    model.set_precision('int8')
+    model.test(images, labels)
+    assert float(torch.mean((model.predictions == predictions).float())) >= 0.95
+    # Inference only
+    with pytest.raises(ValueError):
+        model.train(images, labels)
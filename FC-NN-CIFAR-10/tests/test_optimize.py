@@ -0,0 +1,70 @@
+""" libs.nn.Optimize: update rules & best parameter tracking """
+
+# System imports
+import pytest
+import torch
+
+# Custom imports
+from libs import nn as nnc
+
+from conftest import build
+
+
+@pytest.mark.parametrize('solver', ['sgd', 'momentum', 'nesterov', 'adam'])
+def test_update_rules_match_torch_optim(batch, solver):
+    images, labels = batch
+    model = build(lr=0.01)
+    model.solver = solver
+    nnc.Optimize(model)
+    params = [p.clone().requires_grad_() for p in model.weights + model.biases]
+    # L2 on the weights only
+    groups = [{'params': params[:len(model.weights)], 'weight_decay': model.reg},
+              {'params': params[len(model.weights):], 'weight_decay': 0.}]
+    if solver == 'adam':
+        reference = torch.optim.Adam(groups, lr=model.lr, betas=model.betas, eps=model.eps)
+    else:
+        reference = torch.optim.SGD(groups, lr=model.lr, nesterov=solver == 'nesterov',
+                                    momentum=0. if solver == 'sgd' else model.momentum)
+    for _ in range(3):
+        model.compute_gradients(images, labels)
+        for p, grad in zip(params, model.grad_weights + model.grad_biases):
+            p.grad = grad.clone()
+        model.update_parameters()
+        reference.step()
+        for ours, ref in zip(model.weights + model.biases, params):
+            assert torch.allclose(ours, ref.detach(), rtol=1e-5, atol=1e-7)
+
+
+def test_best_parameters_reproduce_the_optimum_loss(batch):
+    images, labels = batch
+    # Diverges: the best epoch is not the last one
+    model = build(lr=40.)
+    model.epochs = 4
+    model.optimum = {'Loss': float('inf')}
+    optimizer = nnc.Optimize(model)
+    shadows = [p.data_ptr() for p in optimizer.best_weights + optimizer.best_biases]
+    for epoch in range(model.epochs):
+        model.train(images, labels)
+        model.training_loss(images, labels)
+        optimizer.set_optim_param(epoch)
+    assert model.optimum['Epoch'] < model.epochs - 1
+    # Snapshots are copies into the buffers allocated once
+    assert [p.data_ptr() for p in optimizer.best_weights + optimizer.best_biases] == shadows
+    model.training_loss(images, labels)
+    assert model.loss == pytest.approx(model.optimum['Loss'], rel=1e-6)
+
+
+@pytest.mark.parametrize('classifier', ['LogSoftmax', 'Softmax'])
+def test_training_loss_scores_against_labels(batch, classifier):
+    images, labels = batch
+    model = build(batch_norm=True)
+    model.layers[-1].classifier = classifier
+    model.train(images, labels)
+    stats = [stat.clone() for stat in model.stats()]
+    model.training_loss(images, labels)
+    loss = model.loss
+    model.training_loss(images, (labels + 1) % 10)
+    assert model.loss > loss
+    # Running statistics are left as training made them
+    for stat, saved in zip(model.stats(), stats):
+        assert torch.equal(stat, saved)
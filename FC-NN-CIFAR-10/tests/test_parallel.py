@@ -0,0 +1,53 @@
+""" tools.data_parallel & tools.hogwild: multi-process CPU training """
+
+# System imports
+import math
+
+import pytest
+import torch
+
+# Custom imports
+from data import dataset as dset
+from tools import data_parallel as dp
+from tools.hogwild import hogwild
+from tools.train_net import train_loop
+
+from conftest import build, data
+
+
+def dataset(n):
+    images, labels = data(n)
+    return dset.ImageDataset(images.clamp(max=255).byte(), labels)
+
+
+def test_data_parallel_matches_serial(monkeypatch):
+    # 101 images: the tail batch of 1 leaves a worker without a shard
+    train_dataset = dataset(101)
+    models = []
+    for _ in range(2):
+        model = build()
+        model.batch_size, model.epochs = 50, 2
+        models.append(model)
+    serial, parallel = models
+    monkeypatch.setattr(dp.random, 'randint', lambda low, high: 1234)
+    dp.data_parallel(parallel, train_dataset, 2, train_loop)
+    # Same shuffles
+    torch.manual_seed(1234)
+    train_loop(serial, train_dataset, serial.train)
+    assert parallel.loss_history == pytest.approx(serial.loss_history, rel=1e-4)
+    assert parallel.optimum['Loss'] == pytest.approx(serial.optimum['Loss'], rel=1e-4)
+    for ours, ref in zip(parallel.weights + parallel.biases, serial.weights + serial.biases):
+        assert torch.allclose(ours, ref, rtol=1e-4, atol=1e-6)
+
+
+def test_hogwild_updates_the_shared_parameters():
+    model = build()
+    model.batch_size, model.epochs = 25, 2
+    weights = [w.clone() for w in model.weights]
+    shared = model.weights[0]
+    hogwild(model, dataset(100), 2, train_loop)
+    # Trained in place, by the workers
+    assert model.weights[0] is shared
+    assert not any(torch.equal(w, saved) for w, saved in zip(model.weights, weights))
+    assert len(model.loss_history) == model.epochs
+    assert math.isfinite(model.loss) and model.optimum['Loss'] == model.loss
@@ -0,0 +1,79 @@
+""" libs.predictor.Predictor against the ModelNN it was saved from """
+
+# System imports
+import pickle
+
+import pytest
+import torch
+
+# Custom imports
+from libs.predictor import Predictor
+from tools import model_store
+
+from conftest import build
+
+
+@pytest.fixture(params=['sample', 'dataset'])
+def trained(request, batch):
+    """ A model trained a few steps (BatchNorm, either input normalization),
+    its test mode confidences & predictions """
+    images, labels = batch
+    model = build(batch_norm=True)
+    if request.param == 'dataset':
+        model.set_input_norm('dataset', [125., 123., 114.], [63., 62., 66.])
+    for _ in range(3):
+        model.train(images, labels)
+    model.test(images, labels)
+    model.optimum = {'TestAcc': 0., 'Learning rate': model.lr,
+                     'Weights': model.weights, 'Biases': model.biases}
+    model.set_logs()
+    return model, model.output[-1].clone(), model.predictions.clone()
+
+
+def saved(tmp_path, model):
+    """ <model>'s optimum, pickled as save_model does """
+    filename = str(tmp_path / 'model.pkl')
+    with open(filename, 'wb') as f:
+        pickle.dump(model.optimum, f)
+    return filename
+
+
+def check(predictor, images, confidences, predictions, atol):
+    labels, probs = predictor.predict(images)
+    assert torch.equal(labels, predictions)
+    assert torch.allclose(probs.max(1)[0], confidences, atol=atol)
+
+
+def test_predictor_matches_model(tmp_path, batch, trained):
+    model, confidences, predictions = trained
+    filename = saved(tmp_path, model)
+    # Chunked & whole
+    for batch_size in (30, 1000):
+        check(Predictor(filename, batch_size), batch[0], confidences, predictions, 1e-5)
+    labels, probs = Predictor(filename).predict_topk(batch[0], k=3)
+    assert torch.equal(labels[:, 0], predictions)
+    assert bool(torch.all(probs[:, :-1] >= probs[:, 1:]))
+
+
+@pytest.mark.parametrize('save, atol', [(model_store.save_sparse, 1e-5),
+                                        (model_store.save_quantized, 1e-2)])
+def test_inference_copies_match_model(tmp_path, monkeypatch, batch, trained, save, atol):
+    model, confidences, predictions = trained
+    model.prune(0.5)
+    model.sparse_at = 0.4
+    model.test(*batch)
+    confidences, predictions = model.output[-1].clone(), model.predictions.clone()
+    # Directories created as needed
+    monkeypatch.setattr(model_store, 'saved_model_dir', str(tmp_path / 'saved' / 'models') + '/')
+    save('copy.pkl', model)
+    predictor = Predictor(str(tmp_path / 'saved' / 'models' / 'copy.pkl'))
+    labels, probs = predictor.predict(batch[0])
+    # int8 weights may flip a near tie
+    assert float(torch.mean((labels == predictions).float())) >= 0.95
+    assert torch.allclose(probs.max(1)[0], confidences, atol=atol)
+
+
+def test_predictor_empty_batch(tmp_path, trained):
+    filename = saved(tmp_path, trained[0])
+    labels, probs = Predictor(filename).predict(torch.zeros(0, 3, 32, 32).byte())
+    assert labels.shape == (0,) and probs.shape == (0, 10)
@@ -0,0 +1,39 @@
+""" libs.profiler: per layer & phase records, summary & trace """
+
+# System imports
+import json
+
+# Custom imports
+from libs.profiler import Profiler
+
+from conftest import build
+
+
+def test_records_per_layer_phase_and_batch_size(tmp_path, batch, capsys):
+    images, labels = batch
+    model = build(batch_norm=True)
+    model.batch_size = 100
+    profiler = Profiler()
+    profiler.attach(model)
+    model.train(images, labels)
+    model.train(images[:30], labels[:30])
+    model.test(images, labels)
+    profiler.end_epoch(0)
+    records = profiler.records
+    for phase in ('normalize', 'forward', 'loss', 'backward', 'update'):
+        assert any(r.phase == phase and r.calls for r in records.values())
+    # Tail batches in records of their own
+    assert records[('input', 'normalize')].calls == 2
+    assert records[('input @30', 'normalize')].calls == 1
+    assert records[('0: Linear( 3072 x 64 ) @30', 'forward')].calls == 1
+    assert records[('0: Linear( 3072 x 64 )', 'forward')].calls == 2
+    assert records[('parameters', 'update')].calls == 2
+    assert records[('0: Linear( 3072 x 64 )', 'forward')].allocated > 0
+
+    profiler.summary()
+    assert '0: Linear( 3072 x 64 )' in capsys.readouterr().out
+    filename = str(tmp_path / 'trace.json')
+    profiler.save_trace(filename)
+    with open(filename) as f:
+        trace = json.load(f)['traceEvents']
+    assert len([e for e in trace if e['ph'] == 'X']) == len(profiler.events)
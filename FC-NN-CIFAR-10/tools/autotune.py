@@ -0,0 +1,113 @@
+""" Thread count & batch size autotuning for CPU training """
+
+# System imports
+from __future__ import print_function
+
+import hashlib
+import json
+import multiprocessing
+import os
+import platform
+import time
+
+import torch
+
+# Custom imports
+from configs.config_model import set_hyper_parameters, configs
+from libs import nn as nnc
+from tools import create
+
+
+def host_key(cfg):
+    """ Tuned settings are kept per host & architecture, and per 
+    setting of <cfg> that changes the step cost (net, precision, 
+    solver, the sweep itself) """
+    settings = {
+        'MODEL': cfg["MODEL"], 'PRECISION': cfg["PRECISION"], 'SOLVER': cfg["SOLVER"]["TYPE"],
+        'AUTOTUNE': [cfg["AUTOTUNE"][k] for k in ("THREADS", "BATCH_SIZES", "STEPS")]
+    }
+    digest = hashlib.sha1(json.dumps(settings, sort_keys=True).encode()).hexdigest()[:12]
+    return '%s/%s/%s' % (platform.node(), platform.machine(), digest)
+
+
+def load_cache(filename):
+    if not os.path.exists(filename):
+        return {}
+    with open(filename, 'r') as f:
+        return json.load(f)
+
+
+def save_cache(filename, cache):
+    directory = os.path.dirname(filename)
+    if directory and not os.path.exists(directory):
+        os.makedirs(directory)
+    with open(filename, 'w') as f:
+        json.dump(cache, f, indent=1, sort_keys=True)
+
+
+def images_per_sec(model, batch_size, steps):
+    """ Train step throughput of <model> at <batch_size> (synthetic data) """
+    model.compile(batch_size)
+    images = torch.rand(batch_size, 3, 32, 32).mul_(255)
+    labels = torch.LongTensor(batch_size).random_(0, 10)
+    # Warm up (plan, allocator, thread pool)
+    for _ in range(2):
+        model.train(images, labels)
+    start = time.time()
+    for _ in range(steps):
+        model.train(images, labels)
+    return steps * batch_size / (time.time() - start)
+
+
+def sweep(model, tune):
+    """ Images/s of every (threads, batch size) candidate of the
+    <tune> config section (AUTOTUNE), best first """
+    cfg = configs()
+    create.add_layers(model, cfg["MODEL"]["CLASSIFIER"], cfg["MODEL"]["LOSS_LOG_BASE"],
+                      cfg["MODEL"]["BATCH_NORM"])
+    if model.precision == 'int8':
+        # Inference only; train in fp32
+        model.set_precision('float32')
+    model.accum_steps = 1
+
+    cores = multiprocessing.cpu_count()
+    candidates = sorted(set(min(t, cores) for t in tune["THREADS"]))
+    print('\nAutotuning %d thread counts x %d batch sizes (%d cores) ...' % (
+        len(candidates), len(tune["BATCH_SIZES"]), cores))
+    results = []
+    for batch_size in tune["BATCH_SIZES"]:
+        for threads in candidates:
+            torch.set_num_threads(threads)
+            ips = images_per_sec(model, batch_size, tune["STEPS"])
+            print('  threads: %-3d batch size: %-5d %9.0f images/s' % (threads, batch_size, ips))
+            results.append((threads, batch_size, ips))
+        # Free the arena of this batch size
+        model.reset_plans()
+    return sorted(results, key=lambda r: -r[2])
+
+
+def autotune(config_file):
+    """ Best (threads, inter-op threads, batch size) for this host,
+    & config, from the cache (AUTOTUNE: CACHE) or a fresh sweep. Deleting 
+    the entry (or a new torch version, or config change) tunes again """
+    model = nnc.ModelNN()
+    set_hyper_parameters(config_file, model)
+    tune = configs()["AUTOTUNE"]
+    cache = load_cache(tune["CACHE"])
+    key = host_key(configs())
+    tuned = cache.get(key)
+    if tuned is None or tuned['torch'] != torch.__version__:
+        results = sweep(model, tune)
+        threads, batch_size, ips = results[0]
+        cores = multiprocessing.cpu_count()
+        tuned = cache[key] = {
+            'threads': threads, 'batch_size': batch_size, 'images_per_sec': ips,
+            # Inter-op pool: the cores left over by the intra-op threads
+            'interop_threads': max(1, cores - threads),
+            'cores': cores, 'torch': torch.__version__,
+            'tuned': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'sweep': [list(r) for r in results]
+        }
+        save_cache(tune["CACHE"], cache)
+        print('Autotuned settings saved to %s' % tune["CACHE"])
+    return tuned['threads'], tuned['interop_threads'], tuned['batch_size']
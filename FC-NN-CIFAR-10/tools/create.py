@@ -4,13 +4,15 @@
 from __future__ import print_function
 
 # Custom imports
-from configs.config_model import set_hyper_parameters
+from configs.config_model import set_hyper_parameters, configs
+from data import dataset as dset
 from libs import nn as nnc
 from libs.check_args import arguments
 
 
-def create_model():
-    """ Build the net & model """
+def create_model(new=True):
+    """ Build the net & model (<new>: not about to get 
+    the status of a saved model, see model_store.load_model) """
     args = arguments()
     # Define the network
     print('\n' + '+' * 20, '\nBuilding net & model\n' + '+' * 20)
@@ -18,14 +20,33 @@ def create_model():
     model = nnc.ModelNN()
 
     set_hyper_parameters(args.CFG, model)
+    cfg = configs()
 
-    model.add(nnc.LinearLayer(32 * 32 * 3, 2048))
-    model.add(nnc.Activation('ReLU'))
-    model.add(nnc.LinearLayer(2048, 512))
-    model.add(nnc.Activation('ReLU'))
-    model.add(nnc.LinearLayer(512, 128))
-    model.add(nnc.Activation('ReLU'))
-    model.add(nnc.LinearLayer(128, 10))
-    model.add(nnc.CeCriterion('Softmax'))
+    add_layers(model, cfg["MODEL"]["CLASSIFIER"], cfg["MODEL"]["LOSS_LOG_BASE"], 
+               cfg["MODEL"]["BATCH_NORM"])
+    if new and cfg["MODEL"].get("INPUT_NORM", 'sample') == 'dataset':
+        # Statistics computed once, cached next to the dataset
+        model.set_input_norm('dataset', *dset.norm_stats('data'))
+
+    if args.PROFILE:
+        from libs.profiler import Profiler
+        Profiler().attach(model)
+
+    if new:
+        # Resolve the fprop/bprop plan & arena once 
+        # (a loaded model's, by get_logs, for its own layers)
+        model.compile(model.batch_size)
 
     return model
+
+
+def add_layers(model, classifier='LogSoftmax', log_base=10, batch_norm=False):
+    """ The fully connected net (BatchNorm before each 
+    ReLU if <batch_norm>) """
+    for num_ipt, num_opt in [(32 * 32 * 3, 2048), (2048, 512), (512, 128)]:
+        model.add(nnc.LinearLayer(num_ipt, num_opt))
+        if batch_norm:
+            model.add(nnc.BatchNorm(num_opt))
+        model.add(nnc.Activation('ReLU'))
+    model.add(nnc.LinearLayer(128, 10))
+    model.add(nnc.CeCriterion(classifier, log_base))
@@ -0,0 +1,134 @@
+""" Synchronous data-parallel training across CPU processes """
+
+# System imports
+from __future__ import print_function
+
+import os
+import random
+import socket
+import sys
+
+import torch
+import torch.distributed as dist
+import torch.multiprocessing as mp
+
+
+def free_port():
+    """ A free localhost port for the process group """
+    s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    s.bind(('127.0.0.1', 0))
+    port = s.getsockname()[1]
+    s.close()
+    return port
+
+
+def all_reduce_step(model, rank, num_workers):
+    """ Train step on this worker's shard of every global minibatch; 
+    gradients are averaged over all workers before the (identical) update """
+    grads = model.grad_weights + model.grad_biases
+    loss = torch.zeros(1)
+
+    def train_step(images, labels):
+        batch_size = images.size(0)
+        b_start = rank * batch_size // num_workers
+        b_end = (rank + 1) * batch_size // num_workers
+        if b_end > b_start:
+            model.compute_gradients(images[b_start:b_end], labels[b_start:b_end])
+            # Weigh by shard size: the sum of all is the global batch mean
+            shard = float(b_end - b_start) / batch_size
+            for grad in grads:
+                grad.mul_(shard)
+            loss[0] = model.loss * shard
+        else:  # Tail batch smaller than num_workers
+            for grad in grads:
+                grad.zero_()
+            loss[0] = 0
+        for grad in grads:
+            dist.all_reduce(grad)
+        dist.all_reduce(loss)
+        model.loss = float(loss[0])
+        model.update_parameters()
+
+    return train_step
+
+
+def spawn(target, num_workers, args):
+    """ Run target(rank, num_workers, results, *args) in <num_workers> 
+    forked processes; returns what each one put in <results> """
+    ctx = mp.get_context('fork')
+    results = ctx.Queue()
+    workers = [ctx.Process(target=target, args=(rank, num_workers, results) + tuple(args))
+               for rank in range(num_workers)]
+    for p in workers:
+        p.start()
+    summaries = [None] * num_workers
+    for _ in range(num_workers):
+        summary = None
+        while summary is None:
+            try:
+                summary = results.get(timeout=1)
+            except Exception:  # Queue.Empty
+                if any(p.exitcode not in (None, 0) for p in workers):
+                    break
+        if summary is None:
+            break
+        summaries[summary[0]] = summary[1]
+    failed = any(p.exitcode not in (None, 0) for p in workers)
+    for p in workers:
+        if failed:
+            p.terminate()
+        p.join()
+    if failed:
+        print("Parallel training failed.\nExiting ...\n")
+        sys.exit(1)
+    return summaries
+
+
+def worker(rank, num_workers, results, port, seed, model, train_dataset, train_loop, 
+           shared_params):
+    """ One data-parallel training process """
+    if rank:
+        # Only the first worker logs
+        sys.stdout = open(os.devnull, 'w')
+    os.environ['MASTER_ADDR'] = '127.0.0.1'
+    os.environ['MASTER_PORT'] = str(port)
+    dist.init_process_group('gloo', rank=rank, world_size=num_workers)
+    torch.set_num_threads(max(1, torch.get_num_threads() // num_workers))
+    # Same shuffles (global minibatches) on all workers
+    torch.manual_seed(seed)
+
+    train_loop(model, train_dataset, all_reduce_step(model, rank, num_workers))
+
+    summary = None
+    if rank == 0:
+        for shared, p in zip(shared_params, model.weights + model.biases + model.stats()):
+            shared.copy_(p)
+        summary = {
+            'Loss': model.optimum['Loss'], 'Epoch': model.optimum['Epoch'],
+            'Learning rate': model.optimum['Learning rate'], 'lr': model.lr,
+            'loss': model.loss, 'loss_history': model.loss_history,
+        }
+    results.put((rank, summary))
+    dist.destroy_process_group()
+
+
+def data_parallel(model, train_dataset, num_workers, train_loop):
+    """ Run <train_loop> in <num_workers> forked processes, all-reducing 
+    gradients over gloo (localhost); the model gets the trained params """
+    print("Data-parallel training on %d processes." % num_workers)
+    # Trained params come back through shared memory
+    shared_params = [p.clone().share_memory_() for p in 
+                     model.weights + model.biases + model.stats()]
+    port, seed = free_port(), random.randint(0, 2 ** 31 - 1)
+    summary = spawn(worker, num_workers, (port, seed, model, train_dataset, 
+                                          train_loop, shared_params))[0]
+
+    # Trained (optimum) params & status from the first worker
+    for p, shared in zip(model.weights + model.biases + model.stats(), shared_params):
+        p.copy_(shared)
+    model.sync_compute_params()
+    model.lr, model.loss, model.loss_history = \
+        (summary['lr'], summary['loss'], summary['loss_history'])
+    model.optimum['Loss'], model.optimum['Epoch'], model.optimum['Learning rate'] = \
+        (summary['Loss'], summary['Epoch'], summary['Learning rate'])
+    model.optimum['Weights'], model.optimum['Biases'] = (model.weights, model.biases)
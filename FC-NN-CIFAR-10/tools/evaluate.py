@@ -0,0 +1,38 @@
+""" Streaming, bounded-memory evaluation """
+
+# System imports
+from __future__ import print_function
+
+import torch
+
+# Custom imports
+from libs.check_args import using_gpu
+
+
+def evaluate(model, loader):
+    """ Stream the batches of <loader> through the net (fprop only),
+    accumulating loss, accuracy, predictions & confidences.
+    Peak memory depends on the batch size, not on the dataset size. """
+    num_examples = correct = 0
+    loss = 0.
+    predictions, confidences = [], []
+
+    for images, ground_truths in loader:
+        if using_gpu():
+            images = images.cuda()
+        model.test(images, ground_truths)
+        batch_size = images.size(0)
+        # Copy out of the arena, it's reused by the next batch
+        batch_predictions = model.predictions.cpu().clone()
+        predictions.append(batch_predictions)
+        confidences.append(model.output[-1].cpu().clone())
+        correct += int(torch.sum(batch_predictions == torch.as_tensor(ground_truths)))
+        loss += model.loss * batch_size
+        num_examples += batch_size
+
+    model.loss = loss / num_examples
+    model.predictions = torch.cat(predictions)
+    model.confidences = torch.cat(confidences)
+
+    # Accuracy (%)
+    return 100. * correct / num_examples
@@ -0,0 +1,93 @@
+""" TorchScript & ONNX export of trained models (for serving runtimes) """
+
+# System imports
+from __future__ import print_function
+
+import os
+import warnings
+
+import torch
+
+# Custom imports
+from libs.nn import fold_layers
+
+from tools.model_store import saved_model_dir
+
+
+class Normalize(torch.nn.Module):
+    """ Per image (x - mean) / std of the pixels, as libs.nn.normalize """
+
+    def forward(self, images):
+        x = images.reshape(images.size(0), -1).float()
+        return (x - x.mean(1, keepdim=True)) / x.std(1, keepdim=True)
+
+
+class Flatten(torch.nn.Module):
+    """ Pixels as floats, the input normalization folded into the net """
+
+    def forward(self, images):
+        return images.reshape(images.size(0), -1).float()
+
+
+def graph(model):
+    """ torch.nn copy of the inference net of <model>: input
+    normalization, Linear (BatchNorm & dataset input normalization 
+    folded) & ReLU layers, softmax.
+    [N x 3 x 32 x 32] pixels in, [N x 10] class probabilities out """
+    linears = [layer for layer in fold_layers(model) if layer.LayerName == 'Linear']
+    modules = [Normalize() if model.input_norm == 'sample' else Flatten()]
+    for lth, layer in enumerate(linears):
+        linear = torch.nn.Linear(*layer.w.size())
+        with torch.no_grad():
+            linear.weight.copy_(layer.w.t())
+            linear.bias.copy_(layer.b.view(-1))
+        modules.append(linear)
+        if lth < len(linears) - 1:
+            modules.append(torch.nn.ReLU())
+    modules.append(torch.nn.Softmax(dim=1))
+    return torch.nn.Sequential(*modules).eval()
+
+
+def export_model(name, model, directory=saved_model_dir):
+    """ Save <model> as <name>.pt (TorchScript) & <name>.onnx
+    (batch size left dynamic) in <directory> """
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+    net = graph(model)
+    script_file, onnx_file = [os.path.join(directory, name + ext) for ext in ('.pt', '.onnx')]
+    print('\nExporting', name, 'to', directory, end=" ... ")
+    with warnings.catch_warnings():  # TorchScript deprecation
+        warnings.simplefilter('ignore')
+        torch.jit.script(net).save(script_file)
+    example = torch.zeros(1, 3, 32, 32)
+    torch.onnx.export(net, example, onnx_file, input_names=['images'],
+                      output_names=['probs'], opset_version=17, dynamo=False,
+                      dynamic_axes={'images': {0: 'batch'}, 'probs': {0: 'batch'}})
+    print("done.")
+    return script_file, onnx_file
+
+
+def load_runtimes(script_file, onnx_file):
+    """ (name, images -> probs) of the exported files: TorchScript,
+    and ONNX Runtime if it is installed """
+    with warnings.catch_warnings():  # TorchScript deprecation
+        warnings.simplefilter('ignore')
+        script = torch.jit.load(script_file)
+
+    def run_script(images):
+        with torch.no_grad():
+            return script(images)
+
+    runtimes = [('TorchScript', run_script)]
+    try:
+        import onnxruntime
+    except ImportError:
+        print('onnxruntime not installed, skipping the ONNX check.')
+        return runtimes
+    session = onnxruntime.InferenceSession(onnx_file, providers=['CPUExecutionProvider'])
+
+    def run_onnx(images):
+        return torch.from_numpy(session.run(None, {'images': images.numpy()})[0])
+
+    runtimes.append(('ONNX', run_onnx))
+    return runtimes
@@ -3,14 +3,17 @@
 # System imports
 from __future__ import print_function
 
+import torch
+from termcolor import colored
+
 # Custom imports
 from data.dataset import CIFAR10, data_loader
 
 from libs.check_args import arguments, using_gpu
 from libs.nn import Optimize
 
-from model_store import save_model
-import create
+from tools.model_store import save_model
+from tools import create
 
 
 # Model fitting test
@@ -37,9 +40,9 @@ def fit(model=None):
     print("Learning rate: %.4f\n" % model.lr)
 
     # Get one batch from the dataset
-    fitting_loader = data_loader(data=train_dataset.data, 
-        batch_size=CIFAR10.batch_size,
-        model_testing=True)
+    fitting_loader = list(data_loader(train_dataset, 
+        batch_size=model.batch_size,
+        model_testing=True))
 
     # Epochs
     for epoch in range(model.epochs):
@@ -51,6 +54,12 @@ def fit(model=None):
             # Clear cache if using GPU (Unsure of effectiveness)
             if using_gpu():
                 torch.cuda.empty_cache()
+        # Apply what is left of a partial accumulation
+        if model.accumulated:
+            model.update_parameters()
+        # Fitting loss of the parameters set_optim_param snapshots 
+        # (the epoch's final ones, after the last update)
+        model.training_loss(images, labels)
         # Print fitting loss
         print(colored('# Fitting test Loss:', 'red'), end="")
         print('[%.4f] @ L.R: %.9f' % (model.loss, model.lr))
@@ -58,6 +67,8 @@ def fit(model=None):
 
         optimizer.time_decay(epoch, 0.0005)
         optimizer.set_optim_param(epoch)
+        if model.profiler is not None:
+            model.profiler.end_epoch(epoch)
 
     # model.plot_loss('Fitting loss')
 
@@ -71,7 +82,7 @@ def fit(model=None):
     if args.SAVE:
         save_model(args.SAVE, model)
     else:
-        f = raw_input('Do you want to save the model? (y)es/(n)o: ').lower()
+        f = input('Do you want to save the model? (y)es/(n)o: ').lower()
         if f.lower() == 'y' or f.lower() == 'yes':
             save_model('model.pkl', model)
         else:
@@ -0,0 +1,60 @@
+""" Hogwild (lock-free asynchronous) training across CPU processes """
+
+# System imports
+from __future__ import print_function
+
+import os
+import random
+import sys
+
+import torch
+
+# Custom imports
+from data.dataset import ImageDataset
+
+from tools.data_parallel import spawn
+
+
+class Shard(ImageDataset):
+    """ Every <num_workers>-th example of a dataset (views, no copy) """
+
+    def __init__(self, dataset, rank, num_workers):
+        super(Shard, self).__init__(dataset.images[rank::num_workers], 
+                                    dataset.labels[rank::num_workers])
+
+
+def worker(rank, num_workers, results, seed, model, train_dataset, train_loop):
+    """ One Hogwild process: trains on its own shuffled shard, 
+    updating the shared parameters in place without locks """
+    if rank:
+        # Only the first worker logs
+        sys.stdout = open(os.devnull, 'w')
+    torch.set_num_threads(max(1, torch.get_num_threads() // num_workers))
+    torch.manual_seed(seed + rank)
+
+    # Best params are meaningless while others keep updating
+    train_loop(model, Shard(train_dataset, rank, num_workers), model.train, track_best=False)
+
+    results.put((rank, {'lr': model.lr, 'loss': model.loss, 
+                        'loss_history': model.loss_history}))
+
+
+def hogwild(model, train_dataset, num_workers, train_loop):
+    """ Run <train_loop> in <num_workers> forked processes, all applying 
+    update_parameters directly to the model's shared-memory params """
+    print("Hogwild training on %d processes." % num_workers)
+    for p in model.weights + model.biases + model.stats():
+        p.share_memory_()
+    seed = random.randint(0, 2 ** 31 - 1)
+    summaries = spawn(worker, num_workers, (seed, model, train_dataset, train_loop))
+
+    # Params are already in place; loss is averaged over workers
+    model.sync_compute_params()
+    model.lr = summaries[0]['lr']
+    model.loss = sum(s['loss'] for s in summaries) / num_workers
+    model.loss_history = [sum(losses) / num_workers for losses in 
+                          zip(*[s['loss_history'] for s in summaries])]
+    model.optimum['Loss'], model.optimum['Epoch'], model.optimum['Learning rate'] = \
+        (model.loss, model.epochs - 1, model.lr)
+    model.optimum['Weights'], model.optimum['Biases'] = (model.weights, model.biases)
+    print("\nFinal loss in %d epochs is: %f" % (model.epochs, model.loss))
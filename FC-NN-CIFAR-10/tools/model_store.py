@@ -2,12 +2,16 @@
 # System imports
 from __future__ import print_function
 
+import copy
 import os
 import sys
 import pickle
-from subprocess import call
+
+import torch
 
 # Custom imports
+from libs.nn import fold_layers, quantize_per_channel, to_csr
+
 from tools.create import create_model
 
 # Some global vars
@@ -20,8 +24,8 @@ def save_model(filename="model.pkl", model=None):
     if not model:
         print("No model found")
     if not os.path.exists(saved_model_dir):
-        print("Creating outputs/models/ directory")
-        call("mkdir outputs && mkdir outputs/models", shell=True)
+        print("Creating %s directory" % saved_model_dir)
+        os.makedirs(saved_model_dir)
     print('\nSaving', end=" ")
     print(filename, 'to', saved_model_dir, end=" ... ")
     f = open(saved_model_dir + filename, 'wb')
@@ -31,6 +35,67 @@ def save_model(filename="model.pkl", model=None):
     f.close()
 
 
+def folded_input_norm(model):
+    """ Input normalization left to an inference copy of <model> """
+    return 'sample' if model.input_norm == 'sample' else 'folded'
+
+
+def save_inference_copy(filename, model, kind, convert, status=None):
+    """ Save an inference only copy of the model (for libs.predictor): 
+    BatchNorm & dataset input normalization folded, the weights of each 
+    Linear layer stored as convert(weights), <status> entries added """
+    if not os.path.exists(saved_model_dir):
+        print("Creating %s directory" % saved_model_dir)
+        os.makedirs(saved_model_dir)
+    weights, biases, layers = [], [], []
+    for layer in fold_layers(model):
+        if layer.LayerName == 'Linear':
+            weights.append(convert(layer.w))
+            biases.append(layer.b)
+            # Parameters are stored once
+            layer = copy.copy(layer)
+            layer.w = layer.b = None
+        layers.append(layer)
+    inference_status = {
+        'Folded': True, 'Input norm': folded_input_norm(model), 
+        'Arch': model.arch, 'Layer objs': layers, 
+        'Weights': weights, 'Biases': biases, 'TestAcc': model.optimum['TestAcc']
+    }
+    inference_status.update(status or {})
+    print('\nSaving', end=" ")
+    print(filename, '(%s) to' % kind, saved_model_dir, end=" ... ")
+    with open(saved_model_dir + filename, 'wb') as f:
+        pickle.dump(inference_status, f)
+    print("done.")
+
+
+def save_quantized(filename, model):
+    """ Save an inference only copy of the model: Linear weights in 
+    int8 with a scale per output neuron (~4x smaller) """
+    scales = []  # Filled as the weights are quantized
+
+    def quantize(w):
+        q, scale = quantize_per_channel(w)
+        scales.append(scale)
+        return q
+
+    save_inference_copy(filename, model, 'int8', quantize, 
+                        {'Quantized': True, 'Weight scales': scales})
+
+
+def save_sparse(filename, model):
+    """ Save an inference only copy of the (pruned) model: Linear 
+    weights at least <model.sparse_at> sparse in CSR format """
+    def sparse(w):
+        sparsity = 1. - float(torch.count_nonzero(w)) / w.numel()
+        print('Linear( %d x %d ): %.1f%% sparse' % (w.size(0), w.size(1), 100 * sparsity))
+        if model.sparse_at is not None and sparsity >= model.sparse_at:
+            return to_csr(w)
+        return w
+
+    save_inference_copy(filename, model, 'sparse', sparse)
+
+
 def load_model(filename):
     """ Load model dictionary and rebuild the model """
     print('\nChecking saved models ...')
@@ -43,8 +108,8 @@ def load_model(filename):
         print("Model file not found.")
         sys.exit(1)
 
-    # Create a model
-    model = create_model()
+    # Create a model (input statistics come with the status)
+    model = create_model(new=False)
     # Give the status dictionary to the created net
     model.optimum = t
     # Use the given status dictionary to get 
@@ -0,0 +1,132 @@
+""" Accuracy parity reports against the fp32 model """
+
+# System imports
+from __future__ import print_function
+
+import math
+import os
+import shutil
+import tempfile
+import time
+
+import torch
+
+# Custom imports
+from configs.config_model import configs
+
+from data import dataset as dset
+
+from tools.evaluate import evaluate
+from tools.export import export_model, load_runtimes
+from tools.model_store import saved_model_dir
+
+
+def parity_table(results):
+    """ Print loss, accuracy, agreement with the first one & throughput 
+    of every (name, loss, accuracy, predictions, images/s) """
+    _, _, ref_acc, ref_predictions, _ = results[0]
+    print('%-12s %10s %10s %10s %12s %10s' % ('Variant', 'Loss', 'Acc. %', 'dAcc. %', 
+                                             'Agreement %', 'Images/s'))
+    for name, loss, acc, predictions, throughput in results:
+        agreement = 100. * float(torch.mean((predictions == ref_predictions).float()))
+        print('%-12s %10.4f %10.2f %+10.2f %12.2f %10.0f' % (name, loss, acc, acc - ref_acc, 
+                                                            agreement, throughput))
+
+
+def compare_precisions(model, test_dataset, computes):
+    """ Test set results of the model in every compute 
+    precision of <computes> (see parity_table) """
+    results = []
+    precision, loss_scale = model.precision, model.loss_scale
+    for compute in computes:
+        model.set_precision(compute, loss_scale)
+        start = time.time()
+        acc = evaluate(model, dset.stream_loader(test_dataset, 
+            batch_size=configs()["TEST"]["BATCH_SIZE"]))
+        throughput = len(test_dataset) / (time.time() - start)
+        results.append((compute, model.loss, acc, model.predictions, throughput))
+    # Back to the configured precision
+    model.set_precision(precision, loss_scale)
+    return results
+
+
+def precision_parity(model, test_dataset):
+    """ Test set loss/accuracy of the model in every 
+    compute precision against fp32 """
+    parity_table(compare_precisions(model, test_dataset, ('float32', 'bfloat16', 'float16')))
+
+
+def int8_parity(model, test_dataset):
+    """ Test set loss/accuracy of the int8 Linear 
+    layers against fp32, and the weights' size """
+    parity_table(compare_precisions(model, test_dataset, ('float32', 'int8')))
+    num_weights = sum(w.numel() for w in model.weights)
+    print('\nWeights: %.1f MB (fp32) -> %.1f MB (int8 + scales)' % 
+          (4. * num_weights / 2 ** 20, 
+           (num_weights + 4. * sum(w.size(-1) for w in model.weights)) / 2 ** 20))
+
+
+def run_exported(run, test_dataset, log_base):
+    """ (loss, accuracy, predictions, confidences, images/s) of an 
+    exported net's <run> over the test set """
+    loss = correct = 0.
+    predictions, confidences = [], []
+    start = time.time()
+    for images, labels in dset.stream_loader(test_dataset, 
+            batch_size=configs()["TEST"]["BATCH_SIZE"]):
+        probs = run(images)
+        loss -= float(torch.sum(torch.log(probs[range(len(labels)), labels])))
+        value, index = torch.max(probs, 1)
+        correct += int(torch.sum(index == labels))
+        predictions.append(index)
+        confidences.append(value)
+    throughput = len(test_dataset) / (time.time() - start)
+    loss /= len(test_dataset)
+    if log_base:
+        loss /= math.log(log_base)
+    return (loss, 100. * correct / len(test_dataset), torch.cat(predictions), 
+            torch.cat(confidences), throughput)
+
+
+def export_parity(model, test_dataset, name=None):
+    """ Test set loss/accuracy & confidences of the TorchScript/ONNX 
+    export <name> (in outputs/models/) against the fp32 model 
+    (of a temporary export if no <name>) """
+    if name is None:
+        directory = tempfile.mkdtemp()
+        files = export_model('model', model, directory)
+    else:
+        directory = None
+        files = [os.path.join(saved_model_dir, name + ext) for ext in ('.pt', '.onnx')]
+    results = compare_precisions(model, test_dataset, ('float32',))
+    confidences = model.confidences
+    differences = []
+    for runtime, run in load_runtimes(*files):
+        loss, acc, predictions, exported, throughput = run_exported(
+            run, test_dataset, model.layers[-1].log_base)
+        results.append((runtime, loss, acc, predictions, throughput))
+        differences.append((runtime, float(torch.max(torch.abs(exported - confidences)))))
+    parity_table(results)
+    print('\nMax. confidence difference: ' + ', '.join('%s: %.2e' % d for d in differences))
+    if directory is not None:
+        shutil.rmtree(directory)
+
+
+def parity(model, kind='precision', name=None):
+    """ Parity report of type <kind> on the test set 
+    (<name>: saved export, for kind 'export') """
+    print("\n+++++++     PARITY     +++++++\n")
+    model.show_log(test=True)
+
+    # Get data
+    test_dataset = dset.CIFAR10(directory='data', 
+        download=True, 
+        test=True)
+
+    if kind == 'export':
+        export_parity(model, test_dataset, name)
+        return
+    {
+        'precision': precision_parity,
+        'int8': int8_parity,
+    }[kind](model, test_dataset)
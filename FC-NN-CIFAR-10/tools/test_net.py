@@ -3,13 +3,14 @@
 # System imports
 from __future__ import print_function
 
-import numpy as np
-import torch
 from termcolor import colored
 
 # Custom imports
-from libs.check_args import arguments, using_gpu
+from configs.config_model import configs
 
+from libs.check_args import arguments
+
+from tools.evaluate import evaluate
 from tools.model_store import save_model
 
 from data import dataset as dset
@@ -17,7 +18,6 @@ from data import dataset as dset
 
 def test(model, fitting_loader=None):
     """ Evaluate model results on test/train set """
-    global images, ground_truths
     args = arguments()
 
     print("\n+++++++     TESTING     +++++++\n")
@@ -31,29 +31,18 @@ def test(model, fitting_loader=None):
     # If fitting is done, get 
     # the correct dataset to be tested
     if fitting_loader is None:
-        test_loader = dset.data_loader(data=test_dataset.data, 
-            batch_size=dset.CIFAR10.test_size, 
-            shuffled=False)
+        test_loader = dset.stream_loader(test_dataset, 
+            batch_size=configs()["TEST"]["BATCH_SIZE"])
     else:
         test_loader = fitting_loader
     
-    # In case test set is divided in batches    
-    for images, ground_truths in test_loader:
-        if using_gpu():
-            images = images.cuda()
-        model.test(images, ground_truths)
-        # Clear cache if using GPU (Unsure of effectiveness)
-        if using_gpu():
-                torch.cuda.empty_cache()
-
-    # Convert tensor --> numpy ndarray
-    ground_truths = torch.from_numpy(np.array(ground_truths))
+    # Test set is streamed in batches
+    test_acc = evaluate(model, test_loader)
 
     # Print testing loss & accuracy
     print(colored('\n# Testing Loss:', 'red'), end="")
     print('[%.4f]' % model.loss)
-    model.test_acc = model.optimum['TestAcc'] = \
-        (torch.mean((model.predictions == ground_truths).float()) * 100)  # Testing accuracy
+    model.test_acc = model.optimum['TestAcc'] = test_acc  # Testing accuracy
     print(colored('\nTesting accuracy:', 'green'), end="")
     print(" = %.2f %%" % model.test_acc)
 
@@ -68,7 +57,7 @@ def test(model, fitting_loader=None):
     if args.SAVE:
         save_model(args.SAVE, model)
     else:
-        f = raw_input('Do you want to save the model? (y)es/(n)o: ').lower()
+        f = input('Do you want to save the model? (y)es/(n)o: ').lower()
         if f.lower() == 'y' or f.lower() == 'yes':
             save_model('model.pkl', model)
         else:
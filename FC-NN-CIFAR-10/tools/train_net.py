@@ -9,38 +9,14 @@ import torch
 from libs.check_args import arguments, using_gpu
 import libs.nn as nnc
 from data import dataset as dset
-from vision.transforms import Transforms, see
+from vision.transforms import Transforms
 from tools import create
-from model_store import save_model
+from tools.model_store import save_model
 
 
-
-# Training
-def train(model=None):
-
-    args = arguments()
-
-    if model is None:
-        model = create.create_model()
-    
-    print("\n+++++     TRAINING     +++++\n")
-
-    model.show_log(arch=True, train=True)
-
-    # Get data
-    train_dataset = dset.CIFAR10(directory='data', 
-        download=True, 
-        train=True)
-
-    # Data augmentation
-    train_dataset = Transforms(
-        dataset=train_dataset,
-        lr_flip=True,
-        rotate90=True, times=1)
-
-    # Size after augmentation
-    print("Training set size:", len(train_dataset.data), "images.")
-
+def train_loop(model, train_dataset, train_step, track_best=True):
+    """ Epochs of minibatch SGD, <train_step> per batch 
+    (keeping the best params if <track_best>) """
     # Optimizer/Scheduler
     optimizer = nnc.Optimize(model)
 
@@ -48,30 +24,93 @@ def train(model=None):
     print("\n# Stochastic gradient descent #")
     print("Learning rate: %.4f\n" % model.lr)
 
+    if model.prefetch:
+        # Next batches gathered while this one trains
+        prefetcher = dset.Prefetcher(train_dataset, model.batch_size, model.prefetch, 
+                                     shuffled=True, pin_memory=using_gpu())
+
     # Epochs
     for epoch in range(model.epochs):
 
         print('Epoch: [%d/%d]' % (epoch + 1, model.epochs), end=" ")
         # Prepare batches from whole dataset
-        train_loader = dset.data_loader(data=train_dataset.data, 
-            batch_size=dset.CIFAR10.batch_size, 
-            shuffled=True)
+        if model.prefetch:
+            train_loader = prefetcher
+        else:
+            train_loader = dset.data_loader(train_dataset, 
+                batch_size=model.batch_size, 
+                shuffled=True)
+        if model.profiler is not None:
+            train_loader = model.profiler.data(train_loader)
         # Iterate over batches
         for images, labels in train_loader:
             if using_gpu():
-                images = images.cuda()
+                # (pinned uint8 if prefetched)
+                images = images.cuda(non_blocking=True).float()
             # Training round
-            model.train(images, labels)
+            train_step(images, labels)
             # Clear cache if using GPU (Unsure of effectiveness)
             if using_gpu():
                 torch.cuda.empty_cache()
+        # Apply what is left of a partial accumulation
+        if model.accumulated:
+            model.update_parameters()
+        if track_best:
+            # Training loss of the parameters set_optim_param snapshots 
+            # (the epoch's final ones, after the last update), on the last batch
+            model.training_loss(images, labels)
         # Print training loss
         print(colored('# Training Loss:', 'red'), end=" ")
         print('[%.4f] @ L.R: %.4f' % (model.loss, model.lr))
+        if model.prefetch:
+            print(prefetcher.summary())
         model.loss_history.append(model.loss)
 
         optimizer.time_decay(epoch, model.decay_rate)
-        optimizer.set_optim_param(epoch)
+        if track_best:
+            optimizer.set_optim_param(epoch)
+        if model.profiler is not None:
+            model.profiler.end_epoch(epoch)
+
+
+# Training
+def train(model=None):
+
+    args = arguments()
+
+    if model is None:
+        model = create.create_model()
+    
+    print("\n+++++     TRAINING     +++++\n")
+
+    model.show_log(arch=True, train=True)
+
+    # Get data
+    train_dataset = dset.CIFAR10(directory='data', 
+        download=True, 
+        train=True)
+
+    # Data augmentation
+    train_dataset = Transforms(
+        dataset=train_dataset,
+        lr_flip=True,
+        rotate90=True, times=1)
+
+    # Size after augmentation
+    print("Training set size:", len(train_dataset), "images.")
+
+    if args.WORKERS > 1 and not using_gpu():
+        # torch.distributed/multiprocessing only when asked for
+        from tools.data_parallel import data_parallel
+        from tools.hogwild import hogwild
+        if args.HOGWILD:
+            # Asynchronous, lock-free SGD
+            hogwild(model, train_dataset, args.WORKERS, train_loop)
+        else:
+            # Synchronous data-parallel SGD
+            data_parallel(model, train_dataset, args.WORKERS, train_loop)
+    else:
+        train_loop(model, train_dataset, model.train)
     
     # model.plot_loss('Training loss')
     
@@ -85,7 +124,7 @@ def train(model=None):
     if args.SAVE:
         save_model(args.SAVE, model)
     else:
-        f = raw_input("Do you want to save the model? (y)es/(n)o: ").lower()
+        f = input("Do you want to save the model? (y)es/(n)o: ").lower()
         if f.lower() == 'y' or f.lower() == 'yes':
             save_model('model.pkl', model)
         else:
@@ -6,15 +6,10 @@ Return appended (augmented dataset)
 # System imports
 from __future__ import print_function
 import torch
-import numpy as np
-from matplotlib.pyplot import imshow, show
-from data.dataset import CIFAR10
+from data.dataset import ImageDataset
 
-# Global variables
-global image, ground_truth, np_image
 
-
-class Transforms:
+class Transforms(ImageDataset):
     """
     Data transforms (for data augmentation)
 
@@ -24,8 +19,8 @@ class Transforms:
 
         # Alias of <dataset> object
         self.original_dataset = dataset
-        # Augmented data
-        self.data = []
+        # Augmented data, then the original
+        super(Transforms, self).__init__(dataset.images, dataset.labels)
         # Transforms
         self.transform_data(lr_flip, ud_flip, crop, rotate90, times)
 
@@ -37,44 +32,42 @@ class Transforms:
             return
 
         print("Augmenting data:")
+        images = self.original_dataset.images
+        augmented = []
         if lr_flip:
             print("Flipping training examples horizontally ...", end=" ")
-            for image, ground_truth in self.original_dataset.data:
-                np_image = np.flip(image.numpy(), 2)
-                np_image = torch.from_numpy(np_image.copy()).type(torch.FloatTensor)
-                self.data.append((np_image, ground_truth))
+            augmented.append(torch.flip(images, [3]))
             print("done.")
         if ud_flip:
             print("Flipping training examples upside down ...", end=" ")
-            for image, ground_truth in self.original_dataset.data:
-                np_image = np.flip(image.numpy(), 2)
-                np_image = torch.from_numpy(np_image.copy()).type(torch.FloatTensor)
-                self.data.append((np_image, ground_truth))
+            augmented.append(torch.flip(images, [2]))
             print("done.")
         if crop:
             print("Cropping training examples ...", end=" ")
-            for image, ground_truth in self.original_dataset.data:
-                image[:, 0] = image[0, :] = image[:, -1] = image[-1, :] = 0
-                self.data.append((image, ground_truth))
+            # Zero the border pixels
+            cropped = images.clone()
+            cropped[:, :, 0] = cropped[:, :, -1] = cropped[:, :, :, 0] = cropped[:, :, :, -1] = 0
+            augmented.append(cropped)
             print("done.")
         if rotate90:
             if times is None:
                 print("No rotation.")
             else:
-                print("Rotating images by %d degrees ..." % 90 * times, end=" ")
-                for image, ground_truth in self.original_dataset.data:
-                    np_image = np.rot90(image.numpy(), k=1, axes=(1, 2))
-                    np_image = torch.from_numpy(np_image.copy()).type(torch.FloatTensor)
-                    self.data.append((np_image, ground_truth))
+                print("Rotating images by %d degrees ..." % (90 * times), end=" ")
+                augmented.append(torch.rot90(images, times, [2, 3]))
                 print("done.")
-        
-        self.data += self.original_dataset.data
+
+        # One contiguous copy of all (augmented + original) images
+        self.images = torch.cat(augmented + [images])
+        self.labels = self.original_dataset.labels.repeat(len(augmented) + 1)
 
         return
 
 
 def see(image):
     """ Use the vision """
+    from matplotlib.pyplot import imshow, show
+
     image = image.cpu()
     image = image.numpy().reshape(3, 32, 32).transpose(1, 2, 0).astype("uint8")
     imshow(image)